@@ -0,0 +1,90 @@
+"""Online backups of the SQLite database.
+
+Снимок снимается через online backup API SQLite за один шаг с отдельного
+подключения (свой рабочий поток aiosqlite), поэтому event loop не блокируется.
+Порциями копировать нельзя: коммит писателя с другого подключения между порциями
+перезапускает копирование с начала, и под нагрузкой оно может не закончиться.
+Один шаг — одна читающая транзакция WAL: писатель её не ждёт, а снимок
+согласован на момент её начала. Файл сначала пишется во временный
+*.tmp и атомарно переименовывается — в каталоге снимков не бывает «рваных» файлов.
+Восстановление: scripts/restore_backup.py.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Optional
+
+import aiosqlite
+
+import db
+from config import BACKUP_DIR, BACKUP_KEEP, DB_PATH
+from metrics import BACKUP_DURATION, BACKUP_SIZE_BYTES, ERRORS_TOTAL
+
+
+BACKUP_PREFIX = "data-"
+BACKUP_SUFFIX = ".db"
+
+
+def list_backups(backup_dir: str = BACKUP_DIR) -> list[str]:
+    """Пути к снимкам, от новых к старым."""
+    if not os.path.isdir(backup_dir):
+        return []
+    names = [
+        name for name in os.listdir(backup_dir)
+        if name.startswith(BACKUP_PREFIX) and name.endswith(BACKUP_SUFFIX)
+    ]
+    # Имя содержит метку времени, поэтому лексикографический порядок = хронологический
+    return [os.path.join(backup_dir, name) for name in sorted(names, reverse=True)]
+
+
+def rotate_backups(keep: int = BACKUP_KEEP, backup_dir: str = BACKUP_DIR) -> int:
+    """Удалить снимки сверх keep последних. Возвращает число удалённых."""
+    removed = 0
+    for path in list_backups(backup_dir)[keep:]:
+        os.remove(path)
+        removed += 1
+    return removed
+
+
+async def create_backup() -> Optional[str]:
+    """Снять снимок базы и повернуть старые. Возвращает путь к новому снимку."""
+    if DB_PATH == ":memory:":
+        logging.info("Backup skipped: database is in memory")
+        return None
+
+    # Буферизованные ответы должны попасть в снимок
+    await db.flush_responses()
+
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    path = os.path.join(BACKUP_DIR, f"{BACKUP_PREFIX}{datetime.now():%Y%m%d-%H%M%S}{BACKUP_SUFFIX}")
+    tmp_path = f"{path}.tmp"
+
+    start_time = time.perf_counter()
+    try:
+        source = await aiosqlite.connect(DB_PATH)
+        # Целевое подключение используется из потока source, поэтому без check_same_thread
+        target = sqlite3.connect(tmp_path, check_same_thread=False)
+        try:
+            await source.backup(target, pages=-1)
+        finally:
+            target.close()
+            await source.close()
+        os.replace(tmp_path, path)
+    except Exception:
+        ERRORS_TOTAL.labels(type="backup").inc()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    duration = time.perf_counter() - start_time
+    size = os.path.getsize(path)
+    BACKUP_DURATION.observe(duration)
+    BACKUP_SIZE_BYTES.set(size)
+
+    removed = rotate_backups()
+    logging.info(f"Backup {path} created in {duration:.2f}s ({size} bytes), {removed} old removed")
+    return path
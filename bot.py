@@ -8,10 +8,14 @@ from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import BotCommand
 
 from config import BOT_TOKEN
-from db import init_db
 from handlers import router
 from metrics import set_bot_info, start_metrics_server
+from outbound import OutboundThrottle
 from scheduler import setup_scheduler
+from services.deletion_scheduler import DeletionScheduler
+from services.message_service import MessageService
+from services.session_actor import SessionActor
+from storage import get_storage
 
 
 async def set_commands(bot: Bot) -> None:
@@ -51,13 +55,14 @@ async def main() -> None:
     
     # Initialize database
     try:
-        await init_db()
+        await get_storage().init()
     except Exception as e:
         logging.error(f"Failed to initialize database: {e}", exc_info=True)
         raise
     
-    # Create bot instance
+    # Create bot instance; all API calls go through the rate-limited outbound queue
     bot = Bot(token=BOT_TOKEN)
+    bot.session.middleware(OutboundThrottle())
     
     # Set bot info for metrics
     bot_info = await bot.get_me()
@@ -70,6 +75,9 @@ async def main() -> None:
     # Set commands
     await set_commands(bot)
     
+    # Resume message deletions scheduled before the restart
+    await DeletionScheduler.start(bot)
+    
     # Create dispatcher
     dp = Dispatcher(storage=MemoryStorage())
     dp.include_router(router)
@@ -84,6 +92,13 @@ async def main() -> None:
     except Exception as e:
         logging.critical(f"Bot crashed: {e}", exc_info=True)
         raise
+    finally:
+        # Дописываем буферизованные ответы перед выходом
+        scheduler.shutdown(wait=False)
+        await MessageService.flush_summaries()
+        await SessionActor.stop_all()
+        await DeletionScheduler.stop()
+        await get_storage().close()
 
 
 if __name__ == "__main__":
@@ -30,3 +30,46 @@ ADMIN_IDS = {
     for value in _admin_raw.replace(",", " ").split()
     if value.strip().isdigit()
 }
+
+# Write-behind буфер ответов: сброс не реже чем раз в N мс или при накоплении N строк
+RESPONSE_FLUSH_INTERVAL_MS = int(os.getenv("RESPONSE_FLUSH_INTERVAL_MS", "50"))
+RESPONSE_FLUSH_MAX_ROWS = int(os.getenv("RESPONSE_FLUSH_MAX_ROWS", "32"))
+
+# Количество подключений-читателей к SQLite (0 — все запросы через писателя)
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "2"))
+
+# Справочник администраторов чата: через сколько секунд список перечитывается из Telegram
+ADMIN_CACHE_TTL = int(os.getenv("ADMIN_CACHE_TTL", "600"))
+
+# Кэш пользователей: размер, TTL записи и TTL отрицательной записи (секунды)
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "500"))
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "3600"))
+USER_CACHE_NEGATIVE_TTL = int(os.getenv("USER_CACHE_NEGATIVE_TTL", "30"))
+
+# Сколько часов ответы закрытой сессии остаются в responses до переноса в архив
+ARCHIVE_RETENTION_HOURS = int(os.getenv("ARCHIVE_RETENTION_HOURS", "0"))
+
+# Хранилище: sqlite (по умолчанию) или memory (для нагрузочных тестов и бенчмарков)
+STORAGE_ENGINE = os.getenv("STORAGE_ENGINE", "sqlite").strip().lower()
+# Путь к файлу SQLite; ":memory:" — база в памяти
+DB_PATH = os.getenv("DB_PATH", os.path.join("data", "data.db"))
+
+# Порог автоматического WAL checkpoint в страницах (основной checkpoint — ночное обслуживание)
+DB_WAL_AUTOCHECKPOINT = int(os.getenv("DB_WAL_AUTOCHECKPOINT", "1000"))
+
+# Онлайн-бэкапы: каталог снимков (по умолчанию backups/ рядом с базой) и сколько последних хранить
+BACKUP_DIR = os.getenv("BACKUP_DIR", os.path.join(os.path.dirname(DB_PATH), "backups"))
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "7"))
+
+# Правки сообщения со списком: не чаще одной в N мс, промежуточные состояния схлопываются
+SUMMARY_EDIT_INTERVAL_MS = int(os.getenv("SUMMARY_EDIT_INTERVAL_MS", "2000"))
+
+# Лимиты исходящих запросов к Telegram: всего в секунду и сообщений в минуту на группу
+OUTBOUND_GLOBAL_PER_SEC = float(os.getenv("OUTBOUND_GLOBAL_PER_SEC", "30"))
+OUTBOUND_GROUP_PER_MIN = float(os.getenv("OUTBOUND_GROUP_PER_MIN", "20"))
+
+# Удаления сообщений, наступающие в пределах окна (мс), отправляются одним deleteMessages
+DELETE_BATCH_WINDOW_MS = int(os.getenv("DELETE_BATCH_WINDOW_MS", "500"))
+
+# Максимальная длина одного сообщения со списком (лимит Telegram — 4096 символов)
+LIST_PAGE_MAX_CHARS = int(os.getenv("LIST_PAGE_MAX_CHARS", "4096"))
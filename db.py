@@ -1,246 +1,320 @@
 from __future__ import annotations
 
+import asyncio
+import logging
 import os
+import time
+from collections import OrderedDict
 from datetime import datetime, date
-from typing import Optional
+from typing import Literal, Optional
 from contextlib import asynccontextmanager
 
 import aiosqlite
 
-
-DB_DIR = "data"
-DB_PATH = os.path.join(DB_DIR, "data.db")
-
-# Connection pool для повышения производительности
-_db_pool: Optional[aiosqlite.Connection] = None
+from config import (
+    DB_PATH,
+    DB_READ_POOL_SIZE,
+    DB_WAL_AUTOCHECKPOINT,
+    RESPONSE_FLUSH_INTERVAL_MS,
+    RESPONSE_FLUSH_MAX_ROWS,
+    USER_CACHE_MAX_SIZE,
+    USER_CACHE_NEGATIVE_TTL,
+    USER_CACHE_TTL,
+)
+from metrics import (
+    ARCHIVE_RECLAIMED_PAGES,
+    ARCHIVED_ROWS_TOTAL,
+    DB_FLUSH_BATCH_SIZE,
+    DB_FLUSH_DURATION,
+    DB_FLUSH_ERRORS_TOTAL,
+    DB_FREELIST_PAGES,
+    DB_MAINTENANCE_STEP_DURATION,
+    DB_PAGE_COUNT,
+    DB_WAL_PAGES,
+    DB_POOL_IN_USE,
+    DB_POOL_WAIT,
+    USER_CACHE_EVICTIONS,
+    USER_CACHE_REQUESTS,
+    USER_CACHE_SIZE,
+)
+from migrations import apply_migrations
+from models import User
+from utils import normalize_last_name, utc_now_us
+
+
+DB_DIR = os.path.dirname(DB_PATH)
+# У каждого подключения к ":memory:" своя база, поэтому читатели там не используются
+_IN_MEMORY = DB_PATH == ":memory:"
+_READ_POOL_SIZE = 0 if _IN_MEMORY else DB_READ_POOL_SIZE
+
+# Пул подключений: один писатель и до DB_READ_POOL_SIZE читателей.
+# В WAL-режиме читатели не ждут commit писателя, поэтому рендер списка
+# и /status не стоят в очереди за записью на одном рабочем потоке aiosqlite.
+_writer: Optional[aiosqlite.Connection] = None
+_writer_lock = asyncio.Lock()
+_readers: list[aiosqlite.Connection] = []
+_idle_readers: Optional[asyncio.Queue] = None
+# Занятые места в пуле: открытые читатели и те, что ещё открываются
+_reader_slots = 0
+
+
+async def _open_connection(read_only: bool = False) -> aiosqlite.Connection:
+    """Открыть подключение с оптимизированными настройками для минимального потребления памяти."""
+    conn = await aiosqlite.connect(DB_PATH)
+    conn.row_factory = aiosqlite.Row
+    
+    # === Оптимизации SQLite для минимального потребления памяти ===
+    
+    # WAL режим для лучшей производительности при конкурентном доступе
+    # (режим хранится в файле, достаточно выставить его писателем)
+    if not read_only:
+        # Для новой базы включает incremental vacuum сразу; существующую
+        # переводит плановое обслуживание (run_maintenance) одним VACUUM
+        await conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        await conn.execute("PRAGMA journal_mode=WAL")
+    
+    # NORMAL синхронизация - баланс между скоростью и надёжностью
+    await conn.execute("PRAGMA synchronous=NORMAL")
+    
+    # Ограничиваем кэш страниц (по умолчанию 2000 страниц = ~8MB)
+    # Устанавливаем 500 страниц = ~2MB
+    await conn.execute("PRAGMA cache_size=-2000")  # -2000 = 2MB
+    
+    # Ограничиваем размер temp_store в памяти
+    await conn.execute("PRAGMA temp_store=MEMORY")
+    
+    # Отключаем mmap для экономии виртуальной памяти
+    await conn.execute("PRAGMA mmap_size=0")
+    
+    if read_only:
+        # Читатель физически не может ничего записать
+        await conn.execute("PRAGMA query_only=ON")
+    else:
+        # Основной checkpoint делает ночное обслуживание; автоматический порог
+        # поднят, чтобы checkpoint реже выпадал на пользовательские записи
+        await conn.execute(f"PRAGMA wal_autocheckpoint={DB_WAL_AUTOCHECKPOINT}")
+    
+    await conn.commit()
+    return conn
 
 
 async def get_db() -> aiosqlite.Connection:
-    """Получить подключение к БД с оптимизированными настройками для минимального потребления памяти."""
-    global _db_pool
-    if _db_pool is None:
-        _db_pool = await aiosqlite.connect(DB_PATH)
-        _db_pool.row_factory = aiosqlite.Row
-        
-        # === Оптимизации SQLite для минимального потребления памяти ===
-        
-        # WAL режим для лучшей производительности при конкурентном доступе
-        await _db_pool.execute("PRAGMA journal_mode=WAL")
-        
-        # NORMAL синхронизация - баланс между скоростью и надёжностью
-        await _db_pool.execute("PRAGMA synchronous=NORMAL")
-        
-        # Ограничиваем кэш страниц (по умолчанию 2000 страниц = ~8MB)
-        # Устанавливаем 500 страниц = ~2MB
-        await _db_pool.execute("PRAGMA cache_size=-2000")  # -2000 = 2MB
-        
-        # Ограничиваем размер temp_store в памяти
-        await _db_pool.execute("PRAGMA temp_store=MEMORY")
-        
-        # Отключаем mmap для экономии виртуальной памяти
-        await _db_pool.execute("PRAGMA mmap_size=0")
-        
-        # Быстрый checkpoint для WAL
-        await _db_pool.execute("PRAGMA wal_autocheckpoint=100")
-        
-        await _db_pool.commit()
-    return _db_pool
+    """Получить подключение-писатель к БД."""
+    global _writer
+    if _writer is None:
+        async with _writer_lock:
+            if _writer is None:
+                _writer = await _open_connection()
+    return _writer
+
+
+async def _acquire_reader() -> aiosqlite.Connection:
+    """Взять свободное подключение-читатель, открывая новые до DB_READ_POOL_SIZE."""
+    global _idle_readers, _reader_slots
+    if _idle_readers is None:
+        _idle_readers = asyncio.Queue()
+    if _idle_readers.empty() and _reader_slots < _READ_POOL_SIZE:
+        # Место занимаем до первого await — иначе одновременные первые чтения откроют лишние подключения
+        _reader_slots += 1
+        try:
+            # Писатель создаётся первым, чтобы файл уже был в WAL-режиме
+            await get_db()
+            conn = await _open_connection(read_only=True)
+        except BaseException:
+            _reader_slots -= 1
+            raise
+        _readers.append(conn)
+        return conn
+    return await _idle_readers.get()
 
 
 @asynccontextmanager
-async def db_connection():
-    """Context manager для работы с БД."""
+async def db_connection(intent: Literal["read", "write"] = "write"):
+    """Context manager для работы с БД.
+    
+    intent="read" выдаёт подключение-читатель из пула, intent="write" — единственного писателя.
+    Если пул читателей отключён (DB_READ_POOL_SIZE=0 или DB_PATH=":memory:"),
+    чтение тоже идёт через писателя.
+    """
+    if intent == "read" and _READ_POOL_SIZE > 0:
+        start_time = time.perf_counter()
+        db = await _acquire_reader()
+        DB_POOL_WAIT.labels(intent="read").observe(time.perf_counter() - start_time)
+        DB_POOL_IN_USE.labels(intent="read").inc()
+        try:
+            yield db
+        finally:
+            DB_POOL_IN_USE.labels(intent="read").dec()
+            _idle_readers.put_nowait(db)
+        return
+    
+    start_time = time.perf_counter()
     db = await get_db()
+    DB_POOL_WAIT.labels(intent="write").observe(time.perf_counter() - start_time)
+    DB_POOL_IN_USE.labels(intent="write").inc()
     try:
         yield db
     finally:
-        pass  # Не закрываем соединение, используем pool
+        DB_POOL_IN_USE.labels(intent="write").dec()  # Не закрываем соединение, используем pool
+
+
+async def close_db() -> None:
+    """Сбросить буфер ответов и закрыть все подключения к БД (вызывается при остановке бота)."""
+    global _writer, _idle_readers, _flush_task, _reader_slots
+    if _flush_task is not None and not _flush_task.done():
+        _flush_task.cancel()
+    _flush_task = None
+    try:
+        await flush_responses()
+    finally:
+        for conn in _readers:
+            await conn.close()
+        _readers.clear()
+        _reader_slots = 0
+        _idle_readers = None
+        if _writer is not None:
+            await _writer.close()
+            _writer = None
 
 
 async def init_db() -> None:
+    """Привести схему БД к актуальной версии (см. migrations.py)."""
     # Создаем директорию для базы данных, если её нет
-    os.makedirs(DB_DIR, exist_ok=True)
+    if DB_DIR and not _IN_MEMORY:
+        os.makedirs(DB_DIR, exist_ok=True)
     async with db_connection() as db:
-        await db.execute(
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY,
-                last_name TEXT NOT NULL,
-                team TEXT,
-                is_goalie INTEGER DEFAULT 0,
-                updated_at TEXT NOT NULL
-            )
-            """
-        )
-        # Индекс для быстрого поиска по user_id
-        await db.execute(
-            "CREATE INDEX IF NOT EXISTS idx_users_user_id ON users(user_id)"
-        )
-        
-        await db.execute(
-            """
-            CREATE TABLE IF NOT EXISTS sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                chat_id INTEGER NOT NULL,
-                target_date TEXT NOT NULL,
-                is_closed INTEGER NOT NULL DEFAULT 0,
-                list_message_id INTEGER,
-                pinned_message_id INTEGER
-            )
-            """
-        )
-        # Индексы для быстрого поиска сессий
-        await db.execute(
-            "CREATE INDEX IF NOT EXISTS idx_sessions_chat_id ON sessions(chat_id, is_closed)"
-        )
-        await db.execute(
-            "CREATE INDEX IF NOT EXISTS idx_sessions_date ON sessions(chat_id, target_date)"
-        )
-        
-        # Migration: add pinned_message_id if missing
-        cursor = await db.execute("PRAGMA table_info(sessions)")
-        columns = [row[1] for row in await cursor.fetchall()]
-        if "pinned_message_id" not in columns:
-            await db.execute("ALTER TABLE sessions ADD COLUMN pinned_message_id INTEGER")
-        
-        # Migration: add team field to users table
-        cursor = await db.execute("PRAGMA table_info(users)")
-        user_columns = [row[1] for row in await cursor.fetchall()]
-        if "team" not in user_columns:
-            await db.execute("ALTER TABLE users ADD COLUMN team TEXT")
-        
-        # Migration: add team field to responses table
-        cursor = await db.execute("PRAGMA table_info(responses)")
-        response_columns = [row[1] for row in await cursor.fetchall()]
-        if "team" not in response_columns:
-            await db.execute("ALTER TABLE responses ADD COLUMN team TEXT")
-        
-        # Migration: add is_goalie field to users table
-        cursor = await db.execute("PRAGMA table_info(users)")
-        user_columns2 = [row[1] for row in await cursor.fetchall()]
-        if "is_goalie" not in user_columns2:
-            await db.execute("ALTER TABLE users ADD COLUMN is_goalie INTEGER DEFAULT 0")
-        
-        # Migration: add is_goalie field to responses table
-        cursor = await db.execute("PRAGMA table_info(responses)")
-        response_columns2 = [row[1] for row in await cursor.fetchall()]
-        if "is_goalie" not in response_columns2:
-            await db.execute("ALTER TABLE responses ADD COLUMN is_goalie INTEGER DEFAULT 0")
-            
-        await db.execute(
-            """
-            CREATE TABLE IF NOT EXISTS responses (
-                session_id INTEGER NOT NULL,
-                chat_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                last_name TEXT NOT NULL,
-                status TEXT NOT NULL,
-                team TEXT,
-                is_goalie INTEGER DEFAULT 0,
-                updated_at TEXT NOT NULL,
-                PRIMARY KEY (session_id, user_id)
-            )
-            """
-        )
-        # Индекс для быстрого поиска ответов по сессии
-        await db.execute(
-            "CREATE INDEX IF NOT EXISTS idx_responses_session ON responses(session_id)"
-        )
-        
-        await db.commit()
+        version = await apply_migrations(db)
+    logging.info(f"Database schema version {version}")
+
+
+class _UserCache:
+    """LRU-кэш пользователей с TTL и отрицательными записями.
+    
+    Горячие пользователи не вытесняются (в отличие от FIFO), а незарегистрированные
+    кэшируются коротким отрицательным TTL, чтобы каждое их нажатие не шло в SQLite.
+    """
+    
+    def __init__(self, max_size: int, ttl: float, negative_ttl: float) -> None:
+        self._entries: OrderedDict[int, tuple[Optional[User], float]] = OrderedDict()
+        self._max_size = max_size
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+    
+    def get(self, user_id: int) -> object:
+        """Вернуть User, None (известно, что пользователя нет) или _CACHE_MISS."""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            USER_CACHE_REQUESTS.labels(result="miss").inc()
+            return _CACHE_MISS
+        user, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[user_id]
+            USER_CACHE_EVICTIONS.labels(reason="expired").inc()
+            USER_CACHE_SIZE.set(len(self._entries))
+            USER_CACHE_REQUESTS.labels(result="miss").inc()
+            return _CACHE_MISS
+        self._entries.move_to_end(user_id)
+        USER_CACHE_REQUESTS.labels(result="hit" if user else "negative_hit").inc()
+        return user
+    
+    def put(self, user_id: int, user: Optional[User]) -> None:
+        """Сохранить пользователя (или отрицательную запись, если user is None)."""
+        ttl = self._ttl if user else self._negative_ttl
+        self._entries[user_id] = (user, time.monotonic() + ttl)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+            USER_CACHE_EVICTIONS.labels(reason="capacity").inc()
+        USER_CACHE_SIZE.set(len(self._entries))
+    
+    def invalidate(self, user_id: int) -> None:
+        """Удалить запись о пользователе."""
+        if self._entries.pop(user_id, None) is not None:
+            USER_CACHE_SIZE.set(len(self._entries))
 
 
-# Простой кэш информации о пользователях в памяти для уменьшения обращений к БД
-# Максимум 100 записей, этого достаточно для небольшого бота
-_user_cache: dict[int, dict] = {}
-_CACHE_MAX_SIZE = 100
+_CACHE_MISS = object()
+_user_cache = _UserCache(USER_CACHE_MAX_SIZE, USER_CACHE_TTL, USER_CACHE_NEGATIVE_TTL)
 
 
-async def get_user_info(user_id: int) -> dict | None:
+async def get_user_info(user_id: int) -> User | None:
     """Получить информацию о пользователе (фамилия, команда, вратарь)."""
     # Сначала проверяем кэш
-    if user_id in _user_cache:
-        return _user_cache[user_id]
+    cached = _user_cache.get(user_id)
+    if cached is not _CACHE_MISS:
+        return cached
     
-    async with db_connection() as db:
+    async with db_connection("read") as db:
         cursor = await db.execute(
-            "SELECT last_name, team, is_goalie FROM users WHERE user_id = ?",
+            "SELECT user_id, last_name, team, is_goalie, updated_at FROM users WHERE user_id = ?",
             (user_id,),
         )
         row = await cursor.fetchone()
         await cursor.close()
     
-    if row:
-        # Добавляем в кэш
-        if len(_user_cache) >= _CACHE_MAX_SIZE:
-            # Удаляем первый элемент (FIFO)
-            _user_cache.pop(next(iter(_user_cache)))
-        user_info = {
-            "last_name": row["last_name"],
-            "team": row["team"],
-            "is_goalie": bool(row["is_goalie"]) if row["is_goalie"] is not None else False
-        }
-        _user_cache[user_id] = user_info
-        return user_info
-    return None
+    user = User.from_row(row) if row else None
+    _user_cache.put(user_id, user)
+    return user
 
 
 async def get_user_last_name(user_id: int) -> str | None:
     """Получить фамилию пользователя (для обратной совместимости)."""
     info = await get_user_info(user_id)
-    return info["last_name"] if info else None
+    return info.last_name if info else None
 
 
 async def upsert_user_info(user_id: int, last_name: str, team: str, is_goalie: bool = False) -> None:
     """Сохранить информацию о пользователе (фамилия, команда, вратарь)."""
+    now = datetime.utcnow().isoformat()
     async with db_connection() as db:
         await db.execute(
             """
-            INSERT INTO users (user_id, last_name, team, is_goalie, updated_at)
-            VALUES (?, ?, ?, ?, ?)
+            INSERT INTO users (user_id, last_name, name_key, team, is_goalie, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
             ON CONFLICT(user_id) DO UPDATE SET
                 last_name = excluded.last_name,
+                name_key = excluded.name_key,
                 team = excluded.team,
                 is_goalie = excluded.is_goalie,
                 updated_at = excluded.updated_at
             """,
-            (user_id, last_name, team, int(is_goalie), datetime.utcnow().isoformat()),
+            (user_id, last_name, normalize_last_name(last_name), team, int(is_goalie), now),
         )
         await db.commit()
     
-    # Обновляем кэш
-    if len(_user_cache) >= _CACHE_MAX_SIZE:
-        _user_cache.pop(next(iter(_user_cache)))
-    _user_cache[user_id] = {"last_name": last_name, "team": team, "is_goalie": is_goalie}
+    # Запись перезаписывает все поля, поэтому кэш можно сразу заполнить
+    _user_cache.put(
+        user_id,
+        User(user_id=user_id, last_name=last_name, team=team, is_goalie=is_goalie, updated_at_iso=now),
+    )
 
 
 async def upsert_user_last_name(user_id: int, last_name: str) -> None:
     """Сохранить фамилию пользователя (для обратной совместимости)."""
     # Получаем текущую команду, если есть
     info = await get_user_info(user_id)
-    team = info["team"] if info else None
+    team = info.team if info else None
     
     async with db_connection() as db:
         await db.execute(
             """
-            INSERT INTO users (user_id, last_name, team, updated_at)
-            VALUES (?, ?, ?, ?)
+            INSERT INTO users (user_id, last_name, name_key, team, updated_at)
+            VALUES (?, ?, ?, ?, ?)
             ON CONFLICT(user_id) DO UPDATE SET
                 last_name = excluded.last_name,
+                name_key = excluded.name_key,
                 updated_at = excluded.updated_at
             """,
-            (user_id, last_name, team, datetime.utcnow().isoformat()),
+            (user_id, last_name, normalize_last_name(last_name), team, datetime.utcnow().isoformat()),
         )
         await db.commit()
     
-    # Обновляем кэш
-    if len(_user_cache) >= _CACHE_MAX_SIZE:
-        _user_cache.pop(next(iter(_user_cache)))
-    _user_cache[user_id] = {"last_name": last_name, "team": team}
+    # Остальные поля остаются в БД как есть — перечитаем их при следующем запросе
+    _user_cache.invalidate(user_id)
 
 
 async def get_open_session(chat_id: int) -> aiosqlite.Row | None:
-    async with db_connection() as db:
+    async with db_connection("read") as db:
         cursor = await db.execute(
             """
             SELECT * FROM sessions
@@ -256,7 +330,7 @@ async def get_open_session(chat_id: int) -> aiosqlite.Row | None:
 
 
 async def get_session_by_date(chat_id: int, target_date: date) -> aiosqlite.Row | None:
-    async with db_connection() as db:
+    async with db_connection("read") as db:
         cursor = await db.execute(
             """
             SELECT * FROM sessions
@@ -271,12 +345,21 @@ async def get_session_by_date(chat_id: int, target_date: date) -> aiosqlite.Row
     return row
 
 
+async def get_session_version(session_id: int) -> int | None:
+    """Текущая версия строки сессии (None, если сессии нет)."""
+    async with db_connection("read") as db:
+        cursor = await db.execute("SELECT version FROM sessions WHERE id = ?", (session_id,))
+        row = await cursor.fetchone()
+        await cursor.close()
+    return row[0] if row else None
+
+
 async def create_session(chat_id: int, target_date: date) -> int:
     async with db_connection() as db:
         cursor = await db.execute(
             """
-            INSERT INTO sessions (chat_id, target_date, is_closed)
-            VALUES (?, ?, 0)
+            INSERT INTO sessions (chat_id, target_date, is_closed, version)
+            VALUES (?, ?, 0, 1)
             """,
             (chat_id, target_date.isoformat()),
         )
@@ -284,31 +367,132 @@ async def create_session(chat_id: int, target_date: date) -> int:
         return cursor.lastrowid
 
 
-async def close_session(session_id: int) -> None:
+async def _update_session(session_id: int, assignments: str, params: tuple) -> int | None:
+    """UPDATE строки сессии с увеличением version. Возвращает новую версию."""
     async with db_connection() as db:
-        await db.execute(
-            "UPDATE sessions SET is_closed = 1 WHERE id = ?",
-            (session_id,),
+        cursor = await db.execute(
+            f"UPDATE sessions SET {assignments}, version = version + 1 WHERE id = ? RETURNING version",
+            (*params, session_id),
         )
+        row = await cursor.fetchone()
+        await cursor.close()
         await db.commit()
+    return row[0] if row else None
 
 
-async def set_list_message_id(session_id: int, message_id: int | None) -> None:
-    async with db_connection() as db:
-        await db.execute(
-            "UPDATE sessions SET list_message_id = ? WHERE id = ?",
-            (message_id, session_id),
+async def close_session(session_id: int) -> int | None:
+    return await _update_session(session_id, "is_closed = 1, closed_at = ?", (int(time.time()),))
+
+
+async def fetch_list_pages(session_id: int) -> list[tuple[int, str | None]]:
+    """Сообщения списка сессии по порядку страниц: (message_id, text_hash)."""
+    async with db_connection("read") as db:
+        cursor = await db.execute(
+            "SELECT message_id, text_hash FROM list_pages WHERE session_id = ? ORDER BY page",
+            (session_id,),
         )
-        await db.commit()
+        rows = await cursor.fetchall()
+        await cursor.close()
+    return [tuple(row) for row in rows]
 
 
-async def set_pinned_message_id(session_id: int, message_id: int) -> None:
+async def set_list_pages(session_id: int, pages: list[tuple[int, str | None]]) -> int | None:
+    """Заменить страницы списка сессии и увеличить version. Возвращает новую версию."""
     async with db_connection() as db:
-        await db.execute(
-            "UPDATE sessions SET pinned_message_id = ? WHERE id = ?",
-            (message_id, session_id),
+        await db.execute("DELETE FROM list_pages WHERE session_id = ?", (session_id,))
+        await db.executemany(
+            "INSERT INTO list_pages (session_id, page, message_id, text_hash) VALUES (?, ?, ?, ?)",
+            [(session_id, page, message_id, text_hash) for page, (message_id, text_hash) in enumerate(pages)],
         )
+        cursor = await db.execute(
+            "UPDATE sessions SET version = version + 1 WHERE id = ? RETURNING version",
+            (session_id,),
+        )
+        row = await cursor.fetchone()
+        await cursor.close()
         await db.commit()
+    return row[0] if row else None
+
+
+async def set_pinned_message_id(session_id: int, message_id: int) -> int | None:
+    return await _update_session(session_id, "pinned_message_id = ?", (message_id,))
+
+
+# Write-behind буфер ответов: после рассылки в 11:00 десятки нажатий приходят
+# за секунды, и отдельный commit на каждое нажатие упирается в WAL.
+# Ответы копятся по ключу (session_id, user_id) — повторное нажатие того же
+# пользователя просто заменяет запись — и пишутся одной транзакцией.
+_pending_responses: dict[tuple[int, int], tuple] = {}
+_flush_task: Optional[asyncio.Task] = None
+_flush_lock = asyncio.Lock()
+# Сколько записей буфера сейчас пишется (они остаются в буфере до commit)
+_flushing_rows = 0
+# Пауза перед повтором неудачного фонового сброса, секунды
+_FLUSH_RETRY_MIN_DELAY = 1.0
+_FLUSH_RETRY_MAX_DELAY = 30.0
+
+
+async def _flush_later(delay: float = RESPONSE_FLUSH_INTERVAL_MS / 1000) -> None:
+    """Отложенный сброс буфера через delay секунд (по умолчанию RESPONSE_FLUSH_INTERVAL_MS).
+    
+    Неудачный сброс повторяется с удваивающейся паузой: подтверждённые ответы
+    не должны ждать в памяти процесса следующего нажатия или остановки бота.
+    """
+    global _flush_task
+    await asyncio.sleep(delay)
+    _flush_task = None
+    try:
+        await flush_responses()
+    except Exception as e:
+        retry_in = min(max(delay * 2, _FLUSH_RETRY_MIN_DELAY), _FLUSH_RETRY_MAX_DELAY)
+        logging.error(f"Failed to flush buffered responses, retry in {retry_in:.0f}s: {e}")
+        if _pending_responses and _flush_task is None:
+            _flush_task = asyncio.create_task(_flush_later(retry_in))
+
+
+async def flush_responses() -> None:
+    """Записать все накопленные ответы в БД одной транзакцией.
+    
+    Пачка остаётся в буфере до commit, чтобы читатели видели её всё время записи;
+    после commit ключ убирается, только если в нём та же запись, а не более свежий ответ.
+    """
+    global _flushing_rows
+    async with _flush_lock:
+        if not _pending_responses:
+            return
+        batch = list(_pending_responses.values())
+        _flushing_rows = len(batch)
+        
+        start_time = time.perf_counter()
+        try:
+            async with db_connection() as db:
+                await db.executemany(
+                    """
+                    INSERT INTO responses (session_id, chat_id, user_id, last_name, status, team, is_goalie, updated_at, name_key)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(session_id, user_id) DO UPDATE SET
+                        last_name = excluded.last_name,
+                        name_key = excluded.name_key,
+                        status = excluded.status,
+                        team = excluded.team,
+                        is_goalie = excluded.is_goalie,
+                        updated_at = excluded.updated_at
+                    """,
+                    batch,
+                )
+                await db.commit()
+        except Exception:
+            # Неудавшаяся пачка так и осталась в буфере
+            DB_FLUSH_ERRORS_TOTAL.inc()
+            raise
+        finally:
+            _flushing_rows = 0
+        for row in batch:
+            key = (row[0], row[2])
+            if _pending_responses.get(key) is row:
+                del _pending_responses[key]
+        DB_FLUSH_BATCH_SIZE.observe(len(batch))
+        DB_FLUSH_DURATION.observe(time.perf_counter() - start_time)
 
 
 async def upsert_response(
@@ -320,25 +504,25 @@ async def upsert_response(
     team: str | None = None,
     is_goalie: bool = False,
 ) -> None:
-    async with db_connection() as db:
-        await db.execute(
-            """
-            INSERT INTO responses (session_id, chat_id, user_id, last_name, status, team, is_goalie, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(session_id, user_id) DO UPDATE SET
-                last_name = excluded.last_name,
-                status = excluded.status,
-                team = excluded.team,
-                is_goalie = excluded.is_goalie,
-                updated_at = excluded.updated_at
-            """,
-            (session_id, chat_id, user_id, last_name, status, team, int(is_goalie), datetime.utcnow().isoformat()),
-        )
-        await db.commit()
-
-
-async def fetch_responses(session_id: int) -> list[aiosqlite.Row]:
-    async with db_connection() as db:
+    """Поставить ответ в буфер; запись в БД произойдёт пачкой."""
+    global _flush_task
+    _pending_responses[(session_id, user_id)] = (
+        session_id, chat_id, user_id, last_name, status, team, int(is_goalie), utc_now_us(),
+        normalize_last_name(last_name),
+    )
+    if len(_pending_responses) - _flushing_rows >= RESPONSE_FLUSH_MAX_ROWS:
+        await flush_responses()
+    elif _flush_task is None:
+        _flush_task = asyncio.create_task(_flush_later())
+
+
+async def fetch_responses(session_id: int) -> list[aiosqlite.Row | dict]:
+    # Снимок буфера берётся до чтения: ответ, записанный во время SELECT, есть либо в снимке,
+    # либо в прочитанных строках (при повторе в обоих — строка из буфера заменяет строку БД)
+    pending = {
+        user_id: row for (sid, user_id), row in list(_pending_responses.items()) if sid == session_id
+    }
+    async with db_connection("read") as db:
         cursor = await db.execute(
             """
             SELECT user_id, last_name, status, team, is_goalie, updated_at
@@ -350,7 +534,63 @@ async def fetch_responses(session_id: int) -> list[aiosqlite.Row]:
         )
         rows = await cursor.fetchall()
         await cursor.close()
-    return list(rows)
+    
+    # Read-your-writes: накладываем ещё не записанные ответы из буфера
+    if not pending:
+        return list(rows)
+    merged = [row for row in rows if row["user_id"] not in pending]
+    # Колонки в том же порядке, что и в SELECT: модели читают строки по позиции
+    merged.extend(
+        {
+            "user_id": row[2],
+            "last_name": row[3],
+            "status": row[4],
+            "team": row[5],
+            "is_goalie": row[6],
+            "updated_at": row[7],
+        }
+        for row in pending.values()
+    )
+    merged.sort(key=lambda row: row["updated_at"])
+    return merged
+
+
+async def fetch_session_counts(session_id: int) -> dict[tuple[str, str, bool], int]:
+    """Количество участников сессии по ключу (status, team, is_goalie).
+
+    Счётчики ведут триггеры на responses, поэтому чтение не зависит от размера списка.
+    Пустая команда возвращается как "".
+    """
+    pending = [row for (sid, _), row in list(_pending_responses.items()) if sid == session_id]
+
+    # Ещё не записанные ответы: вычитаем прежнее состояние этих пользователей из БД
+    # (в том же запросе, чтобы счётчики и строки были из одного снимка) и прибавляем новое
+    query = "SELECT status, team, is_goalie, count FROM session_counts WHERE session_id = ?"
+    params: list = [session_id]
+    if pending:
+        placeholders = ", ".join("?" for _ in pending)
+        query += f"""
+            UNION ALL
+            SELECT status, COALESCE(team, ''), COALESCE(is_goalie, 0), -1
+            FROM responses
+            WHERE session_id = ? AND user_id IN ({placeholders})
+        """
+        params += [session_id, *(row[2] for row in pending)]
+
+    async with db_connection("read") as db:
+        cursor = await db.execute(query, params)
+        rows = await cursor.fetchall()
+        await cursor.close()
+
+    counts: dict[tuple[str, str, bool], int] = {}
+    for status, team, is_goalie, count in rows:
+        key = (status, team, bool(is_goalie))
+        counts[key] = counts.get(key, 0) + count
+    for row in pending:
+        key = (row[4], row[5] or "", bool(row[6]))
+        counts[key] = counts.get(key, 0) + 1
+    # Триггеры оставляют строки с нулём — наружу отдаём только непустые группы
+    return {key: count for key, count in counts.items() if count}
 
 
 async def delete_response_by_last_name(session_id: int, last_name: str) -> bool:
@@ -358,31 +598,22 @@ async def delete_response_by_last_name(session_id: int, last_name: str) -> bool:
     
     Возвращает True если участник найден и удалён, False если не найден.
     """
+    # Админские операции работают по фамилии — сначала сбрасываем буфер
+    await flush_responses()
+    
     async with db_connection() as db:
-        # Проверяем, есть ли такой участник
         cursor = await db.execute(
-            """
-            SELECT user_id FROM responses
-            WHERE session_id = ? AND LOWER(last_name) = LOWER(?)
-            """,
-            (session_id, last_name),
-        )
-        row = await cursor.fetchone()
-        await cursor.close()
-        
-        if not row:
-            return False
-        
-        # Удаляем участника
-        await db.execute(
             """
             DELETE FROM responses
-            WHERE session_id = ? AND LOWER(last_name) = LOWER(?)
+            WHERE session_id = ? AND name_key = ?
+            RETURNING user_id
             """,
-            (session_id, last_name),
+            (session_id, normalize_last_name(last_name)),
         )
+        deleted = await cursor.fetchall()
+        await cursor.close()
         await db.commit()
-        return True
+    return bool(deleted)
 
 
 async def update_response_team_by_last_name(session_id: int, last_name: str, new_team: str) -> bool:
@@ -390,29 +621,200 @@ async def update_response_team_by_last_name(session_id: int, last_name: str, new
     
     Возвращает True если участник найден и обновлён, False если не найден.
     """
+    # Админские операции работают по фамилии — сначала сбрасываем буфер
+    await flush_responses()
+    
     async with db_connection() as db:
-        # Проверяем, есть ли такой участник
         cursor = await db.execute(
             """
-            SELECT user_id FROM responses
-            WHERE session_id = ? AND LOWER(last_name) = LOWER(?)
+            UPDATE responses
+            SET team = ?, updated_at = ?
+            WHERE session_id = ? AND name_key = ?
+            RETURNING user_id
             """,
-            (session_id, last_name),
+            (new_team, utc_now_us(), session_id, normalize_last_name(last_name)),
         )
-        row = await cursor.fetchone()
+        updated = await cursor.fetchall()
+        await cursor.close()
+        await db.commit()
+    return bool(updated)
+
+
+# Коды статусов в архиве ответов (responses_archive.status)
+ARCHIVE_STATUS_CODES = {"YES": 0, "MAYBE": 1, "NO": 2}
+
+
+async def archive_closed_sessions(retention_seconds: int = 0) -> tuple[int, int]:
+    """Перенести ответы закрытых сессий в responses_archive.
+    
+    Сырые строки остаются в responses ещё retention_seconds после закрытия сессии,
+    после чего переносятся в архив и удаляются, так что в горячих таблицах остаются
+    только открытые сессии. Возвращает (число перенесённых строк, освободившиеся страницы).
+    """
+    # Буферизованные ответы должны попасть в архив вместе с остальными
+    await flush_responses()
+    
+    cutoff = int(time.time()) - retention_seconds
+    status_case = " ".join(
+        f"WHEN '{status}' THEN {code}" for status, code in ARCHIVE_STATUS_CODES.items()
+    )
+    async with db_connection() as db:
+        cursor = await db.execute(
+            """
+            SELECT id FROM sessions
+            WHERE is_closed = 1 AND COALESCE(closed_at, 0) <= ?
+              AND id IN (SELECT DISTINCT session_id FROM responses)
+            """,
+            (cutoff,),
+        )
+        session_ids = [row[0] for row in await cursor.fetchall()]
         await cursor.close()
+        if not session_ids:
+            return 0, 0
         
-        if not row:
-            return False
+        cursor = await db.execute("PRAGMA freelist_count")
+        free_before = (await cursor.fetchone())[0]
+        await cursor.close()
         
-        # Обновляем команду участника
+        placeholders = ", ".join("?" for _ in session_ids)
         await db.execute(
-            """
-            UPDATE responses
-            SET team = ?, updated_at = ?
-            WHERE session_id = ? AND LOWER(last_name) = LOWER(?)
+            f"""
+            INSERT OR IGNORE INTO teams (name)
+            SELECT DISTINCT team FROM responses
+            WHERE session_id IN ({placeholders}) AND team IS NOT NULL
+            """,
+            session_ids,
+        )
+        # Архив только дополняется: поздняя запись в уже перенесённую сессию игнорируется
+        await db.execute(
+            f"""
+            INSERT OR IGNORE INTO responses_archive
+                (session_id, user_id, last_name, status, team_id, is_goalie, updated_at)
+            SELECT r.session_id, r.user_id, r.last_name,
+                   CASE r.status {status_case} END,
+                   t.id, COALESCE(r.is_goalie, 0),
+                   r.updated_at / 1000000
+            FROM responses r
+            LEFT JOIN teams t ON t.name = r.team
+            WHERE r.session_id IN ({placeholders})
             """,
-            (new_team, datetime.utcnow().isoformat(), session_id, last_name),
+            session_ids,
+        )
+        cursor = await db.execute(
+            f"DELETE FROM responses WHERE session_id IN ({placeholders})",
+            session_ids,
+        )
+        archived_rows = cursor.rowcount
+        await cursor.close()
+        await db.execute(
+            f"DELETE FROM session_counts WHERE session_id IN ({placeholders})",
+            session_ids,
+        )
+        # Список закрытой сессии больше не правится
+        await db.execute(
+            f"DELETE FROM list_pages WHERE session_id IN ({placeholders})",
+            session_ids,
         )
         await db.commit()
-        return True
+        
+        cursor = await db.execute("PRAGMA freelist_count")
+        free_after = (await cursor.fetchone())[0]
+        await cursor.close()
+    
+    reclaimed_pages = max(free_after - free_before, 0)
+    ARCHIVED_ROWS_TOTAL.inc(archived_rows)
+    ARCHIVE_RECLAIMED_PAGES.set(reclaimed_pages)
+    logging.info(f"Archived {archived_rows} responses of {len(session_ids)} closed sessions, {reclaimed_pages} pages freed")
+    return archived_rows, reclaimed_pages
+
+
+async def _pragma_value(db: aiosqlite.Connection, pragma: str) -> int:
+    cursor = await db.execute(f"PRAGMA {pragma}")
+    row = await cursor.fetchone()
+    await cursor.close()
+    return row[0]
+
+
+async def fetch_pending_deletions() -> list[tuple[int, int, int]]:
+    """Все отложенные удаления: (chat_id, message_id, due_at в мкс)."""
+    async with db_connection("read") as db:
+        cursor = await db.execute("SELECT chat_id, message_id, due_at FROM pending_deletions")
+        rows = await cursor.fetchall()
+        await cursor.close()
+    return [tuple(row) for row in rows]
+
+
+async def save_pending_deletions(
+    added: list[tuple[int, int, int]],
+    removed: list[tuple[int, int]],
+) -> None:
+    """Добавить и удалить отложенные удаления одной транзакцией."""
+    async with db_connection() as db:
+        if added:
+            await db.executemany(
+                """
+                INSERT INTO pending_deletions (chat_id, message_id, due_at) VALUES (?, ?, ?)
+                ON CONFLICT(chat_id, message_id) DO UPDATE SET due_at = excluded.due_at
+                """,
+                added,
+            )
+        if removed:
+            await db.executemany(
+                "DELETE FROM pending_deletions WHERE chat_id = ? AND message_id = ?",
+                removed,
+            )
+        await db.commit()
+
+
+async def run_maintenance() -> None:
+    """Плановое обслуживание SQLite в тихие часы.
+    
+    wal_checkpoint(TRUNCATE) переносит WAL в основной файл и обнуляет его,
+    PRAGMA optimize и ANALYZE обновляют статистику планировщика,
+    incremental_vacuum возвращает свободные страницы (например, после архивирования).
+    """
+    await flush_responses()
+    
+    async with db_connection() as db:
+        start_time = time.perf_counter()
+        # Размер WAL перед checkpoint — сколько накопилось за период. TRUNCATE после
+        # успешного обнуления возвращает (0, 0, 0), поэтому число кадров в WAL берётся
+        # из предварительного PASSIVE checkpoint (он ничего не ждёт и не блокирует)
+        cursor = await db.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        _busy, wal_pages, _checkpointed = await cursor.fetchone()
+        await cursor.close()
+        wal_pages = max(wal_pages, 0)
+        cursor = await db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        await cursor.fetchall()
+        await cursor.close()
+        DB_MAINTENANCE_STEP_DURATION.labels(step="wal_checkpoint").observe(time.perf_counter() - start_time)
+        DB_WAL_PAGES.set(wal_pages)
+        
+        start_time = time.perf_counter()
+        await db.execute("PRAGMA optimize")
+        DB_MAINTENANCE_STEP_DURATION.labels(step="optimize").observe(time.perf_counter() - start_time)
+        
+        start_time = time.perf_counter()
+        await db.execute("ANALYZE")
+        await db.commit()
+        DB_MAINTENANCE_STEP_DURATION.labels(step="analyze").observe(time.perf_counter() - start_time)
+        
+        start_time = time.perf_counter()
+        if await _pragma_value(db, "auto_vacuum") != 2:
+            # База создана до incremental vacuum: режим включается только полным VACUUM
+            await db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            await db.execute("VACUUM")
+            DB_MAINTENANCE_STEP_DURATION.labels(step="vacuum").observe(time.perf_counter() - start_time)
+        else:
+            cursor = await db.execute("PRAGMA incremental_vacuum")
+            await cursor.fetchall()
+            await cursor.close()
+            await db.commit()
+            DB_MAINTENANCE_STEP_DURATION.labels(step="incremental_vacuum").observe(time.perf_counter() - start_time)
+        
+        page_count = await _pragma_value(db, "page_count")
+        freelist_pages = await _pragma_value(db, "freelist_count")
+    
+    DB_PAGE_COUNT.set(page_count)
+    DB_FREELIST_PAGES.set(freelist_pages)
+    logging.info(f"Database maintenance done: {page_count} pages, {freelist_pages} free, WAL had {wal_pages} pages")
@@ -6,13 +6,12 @@ from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery
 
 from config import CHAT_ID
-from db import get_user_info
 from handlers.keyboard import build_team_keyboard
 from metrics import CALLBACKS_TOTAL, GUESTS_ADDED_TOTAL, PLAYERS_CURRENT, RESPONSES_TOTAL
 from middleware import is_chat_admin, track_duration
 from models import ResponseStatus
 from services.message_service import MessageService
-from services.session_service import SessionService
+from services.session_service import SessionService, UserService
 
 from handlers.states import LastNameState
 
@@ -44,7 +43,7 @@ async def status_callback(callback: CallbackQuery, state: FSMContext, bot: Bot)
     
     status = ResponseStatus(status_str)
     user_id = callback.from_user.id
-    user_info = await get_user_info(user_id)
+    user_info = await UserService.get_info(user_id)
     
     # Если нет фамилии - запрашиваем фамилию
     if not user_info:
@@ -55,8 +54,8 @@ async def status_callback(callback: CallbackQuery, state: FSMContext, bot: Bot)
         await callback.answer()
         return
     
-    last_name = user_info["last_name"]
-    team = user_info.get("team")
+    last_name = user_info.last_name
+    team = user_info.team
     
     # Если нет команды - запрашиваем команду
     if not team:
@@ -172,12 +171,12 @@ async def goalie_callback(callback: CallbackQuery, state: FSMContext, bot: Bot)
         return
     
     user_id = callback.from_user.id
-    user_info = await get_user_info(user_id)
+    user_info = await UserService.get_info(user_id)
     
     # Если пользователь уже зарегистрирован с фамилией и командой
-    if user_info and user_info.get("last_name") and user_info.get("team"):
-        last_name = user_info["last_name"]
-        team = user_info["team"]
+    if user_info and user_info.last_name and user_info.team:
+        last_name = user_info.last_name
+        team = user_info.team
         
         # Сохраняем как вратаря и показываем выбор статуса
         await state.set_state(LastNameState.waiting_goalie_status)
@@ -55,27 +55,11 @@ async def cmd_status(message: Message, bot: Bot) -> None:
     
     chat_id = message.chat.id
     
-    # Delete previous /start or /status message with buttons
-    old_message_id = MessageService.get_last_start_message(chat_id)
-    if old_message_id:
-        await MessageService.delete_message_safe(bot, chat_id, old_message_id)
-    
-    # Force refresh session from DB
-    SessionService.invalidate_cache(CHAT_ID)
-    session = await SessionService.get_or_create_session(CHAT_ID, force_refresh=True)
-    
-    # Also get fresh data directly from DB
-    fresh_session = await SessionService.get_open_session(CHAT_ID)
-    list_message_id = fresh_session.list_message_id if fresh_session else session.list_message_id
-    
-    # Delete previous list message
-    if list_message_id:
-        await MessageService.delete_message_safe(bot, CHAT_ID, list_message_id)
-        await SessionService.update_list_message_id(session.id, None)
-        session.list_message_id = None
-        SessionService.invalidate_cache(CHAT_ID)
+    # Cached session is validated against sessions.version, so its list pages are current
+    session = await SessionService.get_or_create_session(CHAT_ID)
     
     # Create new prompt message with buttons
+    old_message_id = MessageService.get_last_start_message(chat_id)
     text = (
         "Привет! Нажми кнопку под сообщением бота и выбери статус.\n"
         "Если фамилия еще не сохранена, бот попросит ее один раз."
@@ -83,11 +67,15 @@ async def cmd_status(message: Message, bot: Bot) -> None:
     new_message = await message.answer(text, reply_markup=build_prompt_keyboard())
     MessageService.set_last_start_message(chat_id, new_message.message_id)
     
-    # Create new list message
-    await MessageService.ensure_list_message(bot, session)
-    
-    # Invalidate cache with new list_message_id
-    SessionService.invalidate_cache(CHAT_ID)
+    # Previous /start or /status message goes with the list messages in one request
+    stale_ids = []
+    if old_message_id:
+        if chat_id == CHAT_ID:
+            stale_ids.append(old_message_id)
+        else:
+            await MessageService.delete_message_safe(bot, chat_id, old_message_id)
+    # Old list pages are dropped and a new list is sent inside the session actor
+    await MessageService.repost_list_message(bot, session, stale_ids)
 
 
 @router.message(Command("reset"))
@@ -107,16 +95,12 @@ async def cmd_reset(message: Message, bot: Bot) -> None:
     
     open_session = await SessionService.get_open_session(CHAT_ID)
     if open_session:
-        # Unpin and delete old messages
+        # Unpin, delete the list messages and close
         if open_session.pinned_message_id:
             await MessageService.unpin_message_safe(bot, CHAT_ID, open_session.pinned_message_id)
-        if open_session.list_message_id:
-            await MessageService.delete_message_safe(bot, CHAT_ID, open_session.list_message_id)
-        
-        await SessionService.close_session(open_session.id)
-        SessionService.invalidate_cache(CHAT_ID)
+        await MessageService.delete_list_and_close(bot, open_session)
     
-    session = await SessionService.get_or_create_session(CHAT_ID, force_refresh=True)
+    session = await SessionService.get_or_create_session(CHAT_ID)
     await MessageService.ensure_list_message(bot, session)
     
     confirm_msg = await message.answer("Сессия сброшена.")
@@ -149,7 +133,6 @@ async def cmd_close(message: Message, bot: Bot) -> None:
         await MessageService.unpin_message_safe(bot, CHAT_ID, open_session.pinned_message_id)
     
     await SessionService.close_session(open_session.id)
-    SessionService.invalidate_cache(CHAT_ID)
     
     confirm_msg = await message.answer("Сессия закрыта.")
     MessageService.schedule_delete(bot, confirm_msg.chat.id, confirm_msg.message_id, delay=3)
@@ -0,0 +1,23 @@
+"""Chat member updates: keep the administrator directory current."""
+from __future__ import annotations
+
+from aiogram import Router
+from aiogram.types import ChatMemberUpdated
+
+from services.admin_directory import AdminDirectory
+
+
+router = Router()
+
+
+@router.chat_member()
+async def chat_member_updated(event: ChatMemberUpdated) -> None:
+    """Promote or demote the member in the admin directory right away."""
+    AdminDirectory.apply_member_update(event)
+
+
+@router.my_chat_member()
+async def my_chat_member_updated(event: ChatMemberUpdated) -> None:
+    """Reload the chat's administrators after the bot's own rights change."""
+    # Без прав администратора бот не получает chat_member — список мог устареть
+    AdminDirectory.invalidate(event.chat.id)
@@ -91,6 +91,180 @@ TEAM_SELECTIONS_TOTAL = Counter(
     ["team"]
 )
 
+# Write-behind буфер ответов: размер пачки и длительность group commit
+DB_FLUSH_BATCH_SIZE = Histogram(
+    "bot_db_flush_batch_size",
+    "Number of buffered responses written per flush",
+    buckets=[1, 5, 10, 25, 50]
+)
+
+DB_FLUSH_DURATION = Histogram(
+    "bot_db_flush_duration_seconds",
+    "Duration of a buffered responses flush in seconds",
+    buckets=[0.005, 0.01, 0.05, 0.1, 0.5]
+)
+
+DB_FLUSH_ERRORS_TOTAL = Counter(
+    "bot_db_flush_errors_total",
+    "Total number of failed buffered responses flushes"
+)
+
+# Пул подключений к SQLite (writer + readers)
+DB_POOL_WAIT = Histogram(
+    "bot_db_pool_wait_seconds",
+    "Time spent waiting for a database connection",
+    ["intent"],
+    buckets=[0.001, 0.01, 0.05, 0.1, 0.5]
+)
+
+DB_POOL_IN_USE = Gauge(
+    "bot_db_pool_in_use",
+    "Number of database connections currently in use",
+    ["intent"]
+)
+
+# Кэш пользователей (LRU + TTL)
+USER_CACHE_SIZE = Gauge(
+    "bot_user_cache_size",
+    "Number of entries in the user cache"
+)
+
+USER_CACHE_REQUESTS = Counter(
+    "bot_user_cache_requests_total",
+    "User cache lookups by result",
+    ["result"]
+)
+
+USER_CACHE_EVICTIONS = Counter(
+    "bot_user_cache_evictions_total",
+    "User cache evictions by reason",
+    ["reason"]
+)
+
+# Архивирование закрытых сессий
+ARCHIVED_ROWS_TOTAL = Counter(
+    "bot_archived_responses_total",
+    "Total number of responses moved to the archive table"
+)
+
+ARCHIVE_RECLAIMED_PAGES = Gauge(
+    "bot_archive_reclaimed_pages",
+    "Database pages freed by the last archive run"
+)
+
+# Плановое обслуживание SQLite
+DB_MAINTENANCE_STEP_DURATION = Histogram(
+    "bot_db_maintenance_step_duration_seconds",
+    "Duration of database maintenance steps in seconds",
+    ["step"],
+    buckets=[0.01, 0.1, 1.0, 10.0]
+)
+
+DB_WAL_PAGES = Gauge(
+    "bot_db_wal_pages",
+    "Pages in the WAL file before the last maintenance checkpoint"
+)
+
+DB_PAGE_COUNT = Gauge(
+    "bot_db_pages",
+    "Total number of pages in the database file"
+)
+
+DB_FREELIST_PAGES = Gauge(
+    "bot_db_freelist_pages",
+    "Number of unused pages in the database file"
+)
+
+# Онлайн-бэкапы базы
+BACKUP_DURATION = Histogram(
+    "bot_backup_duration_seconds",
+    "Duration of an online database backup in seconds",
+    buckets=[0.1, 1.0, 10.0, 60.0]
+)
+
+BACKUP_SIZE_BYTES = Gauge(
+    "bot_backup_size_bytes",
+    "Size of the last database snapshot in bytes"
+)
+
+# Акторы сессий: очередь команд (голоса, правки списка)
+SESSION_ACTOR_QUEUE_DEPTH = Gauge(
+    "bot_session_actor_queue_depth",
+    "Number of commands waiting in session actors"
+)
+
+SESSION_ACTOR_WAIT = Histogram(
+    "bot_session_actor_wait_seconds",
+    "Time a command waits in a session actor queue",
+    buckets=[0.01, 0.05, 0.1, 0.5, 1.0]
+)
+
+# Схлопнутые обновления списка (вместо отдельной правки сообщения)
+SUMMARY_UPDATES_COALESCED_TOTAL = Counter(
+    "bot_summary_updates_coalesced_total",
+    "Summary update requests merged into an already pending edit"
+)
+
+LIST_EDITS_SKIPPED_TOTAL = Counter(
+    "bot_list_edits_skipped_total",
+    "List message edits skipped because the rendered text did not change"
+)
+
+SUMMARY_BLOCKS_RENDERED_TOTAL = Counter(
+    "bot_summary_blocks_rendered_total",
+    "Summary blocks re-rendered by the incremental composer",
+    ["block"]
+)
+
+# Очередь исходящих запросов к Telegram API
+OUTBOUND_QUEUE_DEPTH = Gauge(
+    "bot_outbound_queue_depth",
+    "Number of Telegram API requests waiting for a rate limit token",
+    ["priority"]
+)
+
+OUTBOUND_THROTTLE_SECONDS = Histogram(
+    "bot_outbound_throttle_seconds",
+    "Time a Telegram API request waited for a rate limit token",
+    ["priority"],
+    buckets=[0.01, 0.1, 1.0, 5.0, 30.0]
+)
+
+OUTBOUND_RETRY_AFTER_TOTAL = Counter(
+    "bot_outbound_retry_after_total",
+    "Total number of RetryAfter (flood control) responses from Telegram",
+    ["method"]
+)
+
+# Отложенные удаления сообщений
+PENDING_DELETIONS = Gauge(
+    "bot_pending_deletions",
+    "Number of messages scheduled for deletion"
+)
+
+DELETION_LATENESS_SECONDS = Gauge(
+    "bot_deletion_lateness_seconds",
+    "How late the last scheduled deletion ran relative to its deadline"
+)
+
+DELETE_BATCH_SIZE = Histogram(
+    "bot_delete_batch_size",
+    "Number of messages per deleteMessages request",
+    buckets=[1, 2, 5, 10, 50, 100]
+)
+
+# Справочник администраторов чатов
+ADMIN_DIRECTORY_REFRESHES_TOTAL = Counter(
+    "bot_admin_directory_refreshes_total",
+    "Chat administrator list reloads via getChatAdministrators by result",
+    ["result"]
+)
+
+ADMIN_DIRECTORY_STALE_READS_TOTAL = Counter(
+    "bot_admin_directory_stale_reads_total",
+    "Admin checks answered from an administrator list older than ADMIN_CACHE_TTL"
+)
+
 
 class _QuietHandler(WSGIRequestHandler):
     """WSGI handler без логирования запросов и с таймаутом на сокетах."""
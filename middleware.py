@@ -3,26 +3,19 @@ from __future__ import annotations
 
 import time
 import functools
-import logging
 from typing import Any, Callable, Awaitable, Optional
 
 from aiogram import Bot
 from aiogram.types import Message, CallbackQuery
 
-from config import ADMIN_IDS, CHAT_ID
+from config import CHAT_ID
 from metrics import REQUEST_DURATION, ERRORS_TOTAL
+from services.admin_directory import AdminDirectory
 
 
 async def is_chat_admin(bot: Bot, chat_id: int, user_id: int) -> bool:
-    """Check if user is admin in the chat."""
-    if user_id in ADMIN_IDS:
-        return True
-    try:
-        member = await bot.get_chat_member(chat_id, user_id)
-        return member.status in {"administrator", "creator"}
-    except Exception as e:
-        logging.warning(f"Failed to check admin status: {e}")
-        return False
+    """Check if user is admin in the chat (in-memory lookup in the admin directory)."""
+    return await AdminDirectory.is_admin(bot, chat_id, user_id)
 
 
 def track_duration(handler_name: str):
@@ -0,0 +1,380 @@
+"""Versioned schema migrations for the SQLite database.
+
+Текущая версия схемы хранится в PRAGMA user_version. При старте читается одно
+число; если схема актуальна, больше ничего не выполняется. Недостающие миграции
+применяются по порядку в одной транзакции вместе с обновлением user_version.
+
+CLI:
+    python migrations.py status   # показать текущую версию и ожидающие миграции
+    python migrations.py apply    # применить ожидающие миграции
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Awaitable, Callable
+
+import aiosqlite
+
+from utils import normalize_last_name, to_epoch_us
+
+
+Migration = Callable[[aiosqlite.Connection], Awaitable[None]]
+
+
+async def _columns(db: aiosqlite.Connection, table: str) -> set[str]:
+    """Имена колонок таблицы (нужно только для баз, созданных до появления user_version)."""
+    cursor = await db.execute(f"PRAGMA table_info({table})")
+    columns = {row[1] for row in await cursor.fetchall()}
+    await cursor.close()
+    return columns
+
+
+async def _m001_base_schema(db: aiosqlite.Connection) -> None:
+    """Базовые таблицы users, sessions, responses и их индексы."""
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            last_name TEXT NOT NULL,
+            team TEXT,
+            is_goalie INTEGER DEFAULT 0,
+            updated_at TEXT NOT NULL
+        )
+        """
+    )
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id INTEGER NOT NULL,
+            target_date TEXT NOT NULL,
+            is_closed INTEGER NOT NULL DEFAULT 0,
+            list_message_id INTEGER,
+            pinned_message_id INTEGER
+        )
+        """
+    )
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS responses (
+            session_id INTEGER NOT NULL,
+            chat_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            last_name TEXT NOT NULL,
+            status TEXT NOT NULL,
+            team TEXT,
+            is_goalie INTEGER DEFAULT 0,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (session_id, user_id)
+        )
+        """
+    )
+
+    # Базы, созданные до версионирования, могут не иметь поздних колонок
+    legacy_columns = {
+        "sessions": [("pinned_message_id", "INTEGER")],
+        "users": [("team", "TEXT"), ("is_goalie", "INTEGER DEFAULT 0")],
+        "responses": [("team", "TEXT"), ("is_goalie", "INTEGER DEFAULT 0")],
+    }
+    for table, wanted in legacy_columns.items():
+        existing = await _columns(db, table)
+        for name, ddl in wanted:
+            if name not in existing:
+                await db.execute(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+
+    # Индекс для быстрого поиска по user_id
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_users_user_id ON users(user_id)")
+    # Индексы для быстрого поиска сессий
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_sessions_chat_id ON sessions(chat_id, is_closed)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_sessions_date ON sessions(chat_id, target_date)")
+    # Индекс для быстрого поиска ответов по сессии
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_responses_session ON responses(session_id)")
+
+
+async def _m002_name_key(db: aiosqlite.Connection) -> None:
+    """Нормализованный ключ фамилии в users/responses с заполнением существующих строк."""
+    for table in ("users", "responses"):
+        if "name_key" in await _columns(db, table):
+            continue
+        await db.execute(f"ALTER TABLE {table} ADD COLUMN name_key TEXT")
+        cursor = await db.execute(f"SELECT rowid, last_name FROM {table}")
+        rows = await cursor.fetchall()
+        await cursor.close()
+        await db.executemany(
+            f"UPDATE {table} SET name_key = ? WHERE rowid = ?",
+            [(normalize_last_name(row[1]), row[0]) for row in rows],
+        )
+    # Индекс для поиска участника сессии по фамилии (удаление/смена команды)
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_responses_name_key ON responses(session_id, name_key)"
+    )
+
+
+async def _create_counts_triggers(db: aiosqlite.Connection) -> None:
+    """Триггеры на responses, поддерживающие session_counts."""
+    # Пустая команда хранится как '' — NULL не участвует в уникальности PRIMARY KEY
+    increment = """
+        INSERT INTO session_counts (session_id, status, team, is_goalie, count)
+        VALUES (NEW.session_id, NEW.status, COALESCE(NEW.team, ''), COALESCE(NEW.is_goalie, 0), 1)
+        ON CONFLICT (session_id, status, team, is_goalie) DO UPDATE SET count = count + 1;
+    """
+    decrement = """
+        UPDATE session_counts SET count = count - 1
+        WHERE session_id = OLD.session_id AND status = OLD.status
+          AND team = COALESCE(OLD.team, '') AND is_goalie = COALESCE(OLD.is_goalie, 0);
+    """
+    await db.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_responses_counts_insert AFTER INSERT ON responses BEGIN {increment} END"
+    )
+    await db.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_responses_counts_delete AFTER DELETE ON responses BEGIN {decrement} END"
+    )
+    await db.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_responses_counts_update
+        AFTER UPDATE OF session_id, status, team, is_goalie ON responses
+        BEGIN {decrement} {increment} END
+        """
+    )
+
+
+async def _m003_session_counts(db: aiosqlite.Connection) -> None:
+    """Счётчики участников по статусу/команде/вратарю, поддерживаемые триггерами."""
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS session_counts (
+            session_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            team TEXT NOT NULL DEFAULT '',
+            is_goalie INTEGER NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (session_id, status, team, is_goalie)
+        ) WITHOUT ROWID
+        """
+    )
+    await _create_counts_triggers(db)
+    await db.execute("DELETE FROM session_counts")
+    await db.execute(
+        """
+        INSERT INTO session_counts (session_id, status, team, is_goalie, count)
+        SELECT session_id, status, COALESCE(team, ''), COALESCE(is_goalie, 0), COUNT(*)
+        FROM responses
+        GROUP BY 1, 2, 3, 4
+        """
+    )
+
+
+async def _m004_responses_archive(db: aiosqlite.Connection) -> None:
+    """Архив ответов закрытых сессий в компактном виде и время закрытия сессии."""
+    await db.execute("ALTER TABLE sessions ADD COLUMN closed_at INTEGER")
+    # Словарь команд: в архиве команда хранится числом
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS teams (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+        """
+    )
+    # status: 0 = YES, 1 = MAYBE, 2 = NO; updated_at: unix-время в секундах
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS responses_archive (
+            session_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            last_name TEXT NOT NULL,
+            status INTEGER NOT NULL,
+            team_id INTEGER,
+            is_goalie INTEGER NOT NULL DEFAULT 0,
+            updated_at INTEGER NOT NULL,
+            PRIMARY KEY (session_id, user_id)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+async def _m005_integer_timestamps(db: aiosqlite.Connection) -> None:
+    """responses.updated_at в целых микросекундах и покрывающий индекс для сортировки."""
+    # У колонки TEXT-аффинити SQLite превратил бы числа обратно в текст — пересоздаём таблицу
+    await db.execute(
+        """
+        CREATE TABLE responses_new (
+            session_id INTEGER NOT NULL,
+            chat_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            last_name TEXT NOT NULL,
+            name_key TEXT,
+            status TEXT NOT NULL,
+            team TEXT,
+            is_goalie INTEGER DEFAULT 0,
+            updated_at INTEGER NOT NULL,
+            PRIMARY KEY (session_id, user_id)
+        )
+        """
+    )
+    cursor = await db.execute(
+        "SELECT session_id, chat_id, user_id, last_name, name_key, status, team, is_goalie, updated_at FROM responses"
+    )
+    rows = await cursor.fetchall()
+    await cursor.close()
+    await db.executemany(
+        "INSERT INTO responses_new VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [(*row[:8], to_epoch_us(datetime.fromisoformat(row[8]))) for row in rows],
+    )
+    # Вместе со старой таблицей удаляются её индексы и триггеры счётчиков
+    await db.execute("DROP TABLE responses")
+    await db.execute("ALTER TABLE responses_new RENAME TO responses")
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_responses_name_key ON responses(session_id, name_key)"
+    )
+    # Покрывающий индекс: fetch_responses читает список сессии уже в порядке updated_at,
+    # без временного B-дерева для сортировки и без обращения к таблице
+    await db.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_responses_session_updated
+        ON responses(session_id, updated_at, user_id, last_name, status, team, is_goalie)
+        """
+    )
+    await _create_counts_triggers(db)
+
+
+async def _m006_session_version(db: aiosqlite.Connection) -> None:
+    """Счётчик версии строки сессии для согласованного кэша."""
+    # Каждая запись в sessions увеличивает version — кэш сверяет его одним чтением по id
+    await db.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+
+
+async def _m007_pending_deletions(db: aiosqlite.Connection) -> None:
+    """Отложенные удаления сообщений — переживают перезапуск бота."""
+    # due_at: unix-время в микросекундах
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS pending_deletions (
+            chat_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            due_at INTEGER NOT NULL,
+            PRIMARY KEY (chat_id, message_id)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+async def _m008_list_text_hash(db: aiosqlite.Connection) -> None:
+    """Хэш последнего отправленного текста списка."""
+    await db.execute("ALTER TABLE sessions ADD COLUMN list_text_hash TEXT")
+
+
+async def _m009_list_pages(db: aiosqlite.Connection) -> None:
+    """Список сессии может занимать несколько сообщений — по строке на страницу."""
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS list_pages (
+            session_id INTEGER NOT NULL,
+            page INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            text_hash TEXT,
+            PRIMARY KEY (session_id, page)
+        ) WITHOUT ROWID
+        """
+    )
+    # Текущее сообщение со списком становится первой страницей;
+    # sessions.list_message_id и list_text_hash больше не используются
+    await db.execute(
+        """
+        INSERT OR IGNORE INTO list_pages (session_id, page, message_id, text_hash)
+        SELECT id, 0, list_message_id, list_text_hash FROM sessions
+        WHERE list_message_id IS NOT NULL
+        """
+    )
+
+
+# Порядок важен: номер версии = позиция в списке (начиная с 1). Только добавлять в конец.
+MIGRATIONS: list[Migration] = [
+    _m001_base_schema,
+    _m002_name_key,
+    _m003_session_counts,
+    _m004_responses_archive,
+    _m005_integer_timestamps,
+    _m006_session_version,
+    _m007_pending_deletions,
+    _m008_list_text_hash,
+    _m009_list_pages,
+]
+LATEST_VERSION = len(MIGRATIONS)
+
+
+async def get_version(db: aiosqlite.Connection) -> int:
+    """Текущая версия схемы (PRAGMA user_version)."""
+    cursor = await db.execute("PRAGMA user_version")
+    row = await cursor.fetchone()
+    await cursor.close()
+    return row[0]
+
+
+def pending_migrations(version: int) -> list[tuple[int, Migration]]:
+    """Миграции, которые нужно применить к базе версии version."""
+    return [(number, migration) for number, migration in enumerate(MIGRATIONS, start=1) if number > version]
+
+
+async def apply_migrations(db: aiosqlite.Connection) -> int:
+    """Применить ожидающие миграции одной транзакцией. Возвращает итоговую версию."""
+    version = await get_version(db)
+    if version > LATEST_VERSION:
+        raise RuntimeError(f"Database schema version {version} is newer than supported {LATEST_VERSION}")
+    pending = pending_migrations(version)
+    if not pending:
+        return version
+
+    await db.execute("BEGIN")
+    try:
+        for number, migration in pending:
+            logging.info(f"Applying migration {number}: {migration.__doc__}")
+            await migration(db)
+        # user_version хранится в заголовке файла и меняется в той же транзакции
+        await db.execute(f"PRAGMA user_version = {LATEST_VERSION}")
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return LATEST_VERSION
+
+
+async def _run_cli(db_path: str, command: str) -> None:
+    if not os.path.exists(db_path) and command == "status":
+        print(f"{db_path}: database does not exist, all {LATEST_VERSION} migrations pending")
+        return
+
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    db = await aiosqlite.connect(db_path)
+    try:
+        version = await get_version(db)
+        print(f"{db_path}: schema version {version}, latest {LATEST_VERSION}")
+        for number, migration in pending_migrations(version):
+            print(f"  pending {number:03d}: {migration.__doc__}")
+        if command == "apply":
+            new_version = await apply_migrations(db)
+            print(f"Applied, schema version is now {new_version}")
+    finally:
+        await db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage bot database schema migrations.")
+    parser.add_argument("command", choices=["status", "apply"], nargs="?", default="status")
+    # Та же переменная и умолчание, что DB_PATH в config.py (сам config требует токен бота)
+    parser.add_argument(
+        "--db",
+        default=os.getenv("DB_PATH", os.path.join("data", "data.db")),
+        help="Path to SQLite database (default: $DB_PATH or data/data.db)",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    asyncio.run(_run_cli(args.db, args.command))
+
+
+if __name__ == "__main__":
+    main()
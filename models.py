@@ -4,7 +4,11 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 from datetime import date, datetime
 from enum import Enum
-from typing import Optional
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Callable, Optional, Sequence
+
+from utils import from_epoch_us, utc_now_us
 
 
 class ResponseStatus(str, Enum):
@@ -18,49 +22,141 @@ class ResponseStatus(str, Enum):
         return tuple(s.value for s in cls)
 
 
-@dataclass
+_STATUS_BY_VALUE = {status.value: status for status in ResponseStatus}
+
+
+class RowLayout:
+    """Column positions of one result set.
+    
+    Позиции колонок определяются один раз по описанию курсора (ключам первой
+    строки), дальше строки читаются по индексу — без row.keys() и поиска
+    по имени на каждое поле каждой строки.
+    """
+    __slots__ = ("_positions", "_width")
+    
+    def __init__(self, columns: Sequence[str]) -> None:
+        self._positions = {name: pos for pos, name in enumerate(columns)}
+        self._width = len(columns)
+    
+    @staticmethod
+    def of(row) -> RowLayout:
+        return _layout(tuple(row.keys()))
+    
+    def reader(self, fields: Sequence[tuple[str, Any]]) -> Callable[[Sequence], tuple]:
+        """Getter of the (name, default) fields from a row's values; absent columns read as the default."""
+        positions = [self._positions.get(name) for name, _ in fields]
+        defaults = tuple(default for (_, default), pos in zip(fields, positions) if pos is None)
+        if not defaults:
+            return itemgetter(*positions)
+        # Отсутствующие колонки читаются из дописанного в конец кортежа значений по умолчанию
+        padded = iter(range(self._width, self._width + len(defaults)))
+        get = itemgetter(*(pos if pos is not None else next(padded) for pos in positions))
+        return lambda values: get((*values, *defaults))
+
+
+@lru_cache(maxsize=32)
+def _layout(columns: tuple[str, ...]) -> RowLayout:
+    return RowLayout(columns)
+
+
+def _row_values(row) -> Sequence:
+    # dict-строки MemoryStorage читаются по позиции так же, как sqlite3.Row
+    return tuple(row.values()) if isinstance(row, dict) else row
+
+
+def _read_rows(rows: Sequence, fields: Sequence[tuple[str, Any]]):
+    """Values of the fields for every row of one result set."""
+    if not rows:
+        return
+    read = RowLayout.of(rows[0]).reader(fields)
+    for row in rows:
+        yield read(_row_values(row))
+
+
+_USER_FIELDS = (("user_id", None), ("last_name", None), ("team", None), ("is_goalie", 0), ("updated_at", None))
+
+
+@dataclass(slots=True)
 class User:
-    """User model."""
+    """User model.
+    
+    updated_at хранится строкой ISO, как в БД, и разбирается только при обращении.
+    """
     user_id: int
     last_name: str
     team: Optional[str] = None
     is_goalie: bool = False
-    updated_at: datetime = field(default_factory=datetime.utcnow)
+    updated_at_iso: Optional[str] = None
+    
+    @property
+    def updated_at(self) -> datetime:
+        return datetime.fromisoformat(self.updated_at_iso) if self.updated_at_iso else datetime.utcnow()
     
     @classmethod
     def from_row(cls, row) -> User:
-        return cls(
-            user_id=row["user_id"],
-            last_name=row["last_name"],
-            team=row["team"] if "team" in row.keys() else None,
-            is_goalie=bool(row["is_goalie"]) if "is_goalie" in row.keys() and row["is_goalie"] else False,
-            updated_at=datetime.fromisoformat(row["updated_at"]) if row["updated_at"] else datetime.utcnow()
-        )
+        return cls.from_rows([row])[0]
+    
+    @classmethod
+    def from_rows(cls, rows: Sequence) -> list[User]:
+        return [
+            cls(user_id, last_name, team, bool(is_goalie), updated_at)
+            for user_id, last_name, team, is_goalie, updated_at in _read_rows(rows, _USER_FIELDS)
+        ]
+
+
+@dataclass(frozen=True, slots=True)
+class ListPage:
+    """One message of the session list and the hash of the text it shows."""
+    message_id: int
+    text_hash: Optional[str] = None
+
 
+_SESSION_FIELDS = (
+    ("id", None),
+    ("chat_id", None),
+    ("target_date", None),
+    ("is_closed", 0),
+    ("pinned_message_id", None),
+    ("version", 1),
+)
 
-@dataclass
+
+@dataclass(slots=True)
 class Session:
-    """Session model."""
+    """Session model.
+    
+    list_pages хранятся в отдельной таблице и подгружаются SessionService.
+    """
     id: int
     chat_id: int
     target_date: date
     is_closed: bool = False
-    list_message_id: Optional[int] = None
     pinned_message_id: Optional[int] = None
+    list_pages: list[ListPage] = field(default_factory=list)
+    version: int = 1
+    
+    @property
+    def list_message_ids(self) -> list[int]:
+        return [page.message_id for page in self.list_pages]
     
     @classmethod
     def from_row(cls, row) -> Session:
-        target_date = row["target_date"]
-        if isinstance(target_date, str):
-            target_date = date.fromisoformat(target_date)
-        return cls(
-            id=row["id"],
-            chat_id=row["chat_id"],
-            target_date=target_date,
-            is_closed=bool(row["is_closed"]),
-            list_message_id=row["list_message_id"] if "list_message_id" in row.keys() else None,
-            pinned_message_id=row["pinned_message_id"] if "pinned_message_id" in row.keys() else None
-        )
+        return cls.from_rows([row])[0]
+    
+    @classmethod
+    def from_rows(cls, rows: Sequence) -> list[Session]:
+        return [
+            cls(
+                id=session_id,
+                chat_id=chat_id,
+                target_date=date.fromisoformat(target_date) if isinstance(target_date, str) else target_date,
+                is_closed=bool(is_closed),
+                pinned_message_id=pinned_message_id,
+                version=version,
+            )
+            for session_id, chat_id, target_date, is_closed, pinned_message_id, version
+            in _read_rows(rows, _SESSION_FIELDS)
+        ]
     
     def to_dict(self) -> dict:
         """Convert to dict for backward compatibility."""
@@ -69,14 +165,31 @@ class Session:
             "chat_id": self.chat_id,
             "target_date": self.target_date.isoformat(),
             "is_closed": int(self.is_closed),
-            "list_message_id": self.list_message_id,
-            "pinned_message_id": self.pinned_message_id
+            "list_message_ids": self.list_message_ids,
+            "pinned_message_id": self.pinned_message_id,
+            "version": self.version
         }
 
 
-@dataclass
+_RESPONSE_FIELDS = (
+    ("session_id", 0),
+    ("chat_id", 0),
+    ("user_id", None),
+    ("last_name", None),
+    ("status", None),
+    ("team", None),
+    ("is_goalie", 0),
+    ("updated_at", None),
+)
+
+
+@dataclass(slots=True)
 class Response:
-    """Player response model."""
+    """Player response model.
+    
+    Время хранится как в БД — целыми микросекундами UTC; datetime строится
+    только при обращении к updated_at, сортировке он не нужен.
+    """
     session_id: int
     chat_id: int
     user_id: int
@@ -84,23 +197,37 @@ class Response:
     status: ResponseStatus
     team: Optional[str] = None
     is_goalie: bool = False
-    updated_at: datetime = field(default_factory=datetime.utcnow)
+    updated_at_us: int = field(default_factory=utc_now_us)
+    
+    @property
+    def updated_at(self) -> datetime:
+        return from_epoch_us(self.updated_at_us)
     
     @classmethod
     def from_row(cls, row) -> Response:
-        return cls(
-            session_id=row["session_id"] if "session_id" in row.keys() else 0,
-            chat_id=row["chat_id"] if "chat_id" in row.keys() else 0,
-            user_id=row["user_id"],
-            last_name=row["last_name"],
-            status=ResponseStatus(row["status"]),
-            team=row["team"] if "team" in row.keys() else None,
-            is_goalie=bool(row["is_goalie"]) if "is_goalie" in row.keys() and row["is_goalie"] else False,
-            updated_at=datetime.fromisoformat(row["updated_at"]) if row["updated_at"] else datetime.utcnow()
-        )
-
-
-@dataclass
+        return cls.from_rows([row])[0]
+    
+    @classmethod
+    def from_rows(cls, rows: Sequence) -> list[Response]:
+        """Responses of one result set; column positions are resolved once for all rows."""
+        statuses = _STATUS_BY_VALUE
+        return [
+            cls(
+                session_id,
+                chat_id,
+                user_id,
+                last_name,
+                statuses[status],
+                team,
+                bool(is_goalie),
+                updated_at or utc_now_us(),
+            )
+            for session_id, chat_id, user_id, last_name, status, team, is_goalie, updated_at
+            in _read_rows(rows, _RESPONSE_FIELDS)
+        ]
+
+
+@dataclass(slots=True)
 class PlayerInfo:
     """Player info for summary lists."""
     last_name: str
@@ -109,7 +236,7 @@ class PlayerInfo:
     is_goalie: bool = False
 
 
-@dataclass
+@dataclass(slots=True)
 class SessionSummary:
     """Session summary with player lists."""
     session: Session
@@ -0,0 +1,211 @@
+"""Rate-limited, prioritized outbound Telegram API requests.
+
+Подключается как request middleware к сессии бота, поэтому через него идут все
+вызовы API — из обработчиков, планировщика и сервисов — без изменений в коде.
+
+Лимиты Telegram моделируются token bucket-ами: общий на бота (запросов в секунду)
+и по чату для методов, создающих или меняющих сообщения (в группе — сообщений
+в минуту, в личке — одно в секунду). Когда токенов нет, запросы ждут в очереди
+по приоритету: ответы на callback, затем отправка и правка сообщений, затем
+удаления. TelegramRetryAfter выдерживается и запрос повторяется — кроме правок:
+их делает актор сессии, и ожидание в нём задержало бы все голоса этой сессии,
+поэтому правка получает ошибку сразу, а MessageService повторяет её позже сам.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import time
+from typing import Any, Optional
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    AnswerCallbackQuery,
+    DeleteMessage,
+    DeleteMessages,
+    EditMessageText,
+    GetUpdates,
+    TelegramMethod,
+    UnpinChatMessage,
+)
+from aiogram.methods.base import TelegramType
+
+from config import OUTBOUND_GLOBAL_PER_SEC, OUTBOUND_GROUP_PER_MIN
+from metrics import OUTBOUND_QUEUE_DEPTH, OUTBOUND_RETRY_AFTER_TOTAL, OUTBOUND_THROTTLE_SECONDS
+
+
+# Классы приоритета: меньше — раньше
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_CLEANUP = 2
+_PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_NORMAL: "normal",
+    PRIORITY_CLEANUP: "cleanup",
+}
+
+# Запас для коротких всплесков в группе и лимит в личном чате
+_GROUP_BURST = 5
+_PRIVATE_PER_SEC = 1.0
+# RetryAfter дольше этого не выжидаем — ошибка уходит вызывающему
+_MAX_RETRY_AFTER = 60
+_MAX_RETRIES = 3
+# Методы, которые после RetryAfter не повторяются на месте (вызывающий повторит сам)
+_NOT_RETRIED = (EditMessageText,)
+
+# Методы, на которые действует лимит сообщений в чате
+_CHAT_LIMITED_PREFIXES = ("Send", "Edit", "Copy", "Forward")
+
+
+def _priority(method: TelegramMethod) -> int:
+    if isinstance(method, AnswerCallbackQuery):
+        return PRIORITY_INTERACTIVE
+    if isinstance(method, (DeleteMessage, DeleteMessages, UnpinChatMessage)):
+        return PRIORITY_CLEANUP
+    return PRIORITY_NORMAL
+
+
+def _limited_chat(method: TelegramMethod) -> Optional[int | str]:
+    """Chat whose message limit applies to the method, if any."""
+    if not type(method).__name__.startswith(_CHAT_LIMITED_PREFIXES):
+        return None
+    return getattr(method, "chat_id", None)
+
+
+class _TokenBucket:
+    """Token bucket with a pause set by RetryAfter."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.paused_until - now)
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class OutboundThrottle(BaseRequestMiddleware):
+    """Request middleware that queues Bot API calls under Telegram's rate limits."""
+
+    def __init__(
+        self,
+        global_per_sec: float = OUTBOUND_GLOBAL_PER_SEC,
+        group_per_min: float = OUTBOUND_GROUP_PER_MIN,
+    ) -> None:
+        self._global = _TokenBucket(global_per_sec, global_per_sec)
+        self._group_per_min = group_per_min
+        self._chats: dict[int | str, _TokenBucket] = {}
+        # (priority, seq, chat_id, future) — порядок обслуживания
+        self._waiting: list[tuple[int, int, Optional[int | str], asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Any:
+        # Long polling не лимитируется и не должен стоять в очереди
+        if isinstance(method, GetUpdates):
+            return await make_request(bot, method)
+
+        priority = _priority(method)
+        chat_id = _limited_chat(method)
+        for attempt in range(_MAX_RETRIES + 1):
+            await self._acquire(priority, chat_id)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                OUTBOUND_RETRY_AFTER_TOTAL.labels(method=type(method).__name__).inc()
+                if e.retry_after > _MAX_RETRY_AFTER:
+                    raise
+                bucket = self._chat_bucket(chat_id) if chat_id is not None else self._global
+                bucket.pause(e.retry_after)
+                if attempt == _MAX_RETRIES or isinstance(method, _NOT_RETRIED):
+                    raise
+                logging.warning(f"Flood control on {type(method).__name__}, retry after {e.retry_after}s")
+
+    def _chat_bucket(self, chat_id: int | str) -> _TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if isinstance(chat_id, int) and chat_id > 0:
+                bucket = _TokenBucket(_PRIVATE_PER_SEC, 1)
+            else:
+                bucket = _TokenBucket(self._group_per_min / 60, _GROUP_BURST)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def _acquire(self, priority: int, chat_id: Optional[int | str]) -> None:
+        """Wait for this request's turn and tokens."""
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.append((priority, next(self._seq), chat_id, future))
+        self._waiting.sort(key=lambda item: item[:2])
+        depth = OUTBOUND_QUEUE_DEPTH.labels(priority=_PRIORITY_NAMES[priority])
+        depth.inc()
+        self._wakeup.set()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+        start_time = time.perf_counter()
+        try:
+            await future
+        finally:
+            depth.dec()
+            OUTBOUND_THROTTLE_SECONDS.labels(priority=_PRIORITY_NAMES[priority]).observe(
+                time.perf_counter() - start_time
+            )
+
+    async def _run(self) -> None:
+        """Grant tokens to waiting requests in priority order."""
+        while self._waiting:
+            self._wakeup.clear()
+            now = time.monotonic()
+            global_wait = self._global.wait_time(now)
+            earliest = global_wait
+            granted = None
+            if global_wait <= 0:
+                earliest = float("inf")
+                # Первый по приоритету запрос, чей чат не упёрся в лимит
+                for item in self._waiting:
+                    _, _, chat_id, future = item
+                    if future.done():
+                        granted = item
+                        break
+                    chat_wait = self._chat_bucket(chat_id).wait_time(now) if chat_id is not None else 0.0
+                    if chat_wait <= 0:
+                        granted = item
+                        break
+                    earliest = min(earliest, chat_wait)
+
+            if granted is not None:
+                self._waiting.remove(granted)
+                future = granted[3]
+                if not future.done():
+                    self._global.take()
+                    if granted[2] is not None:
+                        self._chat_bucket(granted[2]).take()
+                    future.set_result(None)
+                continue
+
+            # Ждём освобождения токена или нового (возможно, более срочного) запроса
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), earliest)
+            except asyncio.TimeoutError:
+                pass
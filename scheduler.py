@@ -10,6 +10,7 @@ from handlers.keyboard import build_prompt_keyboard
 from metrics import SCHEDULER_JOBS_TOTAL
 from services.message_service import MessageService
 from services.session_service import SessionService
+from storage import get_storage
 from utils import parse_notify_time
 
 
@@ -21,16 +22,9 @@ async def send_daily_notification(bot: Bot) -> None:
     if session.is_closed:
         return
     
-    # Delete previous pinned message (with buttons) if exists
-    if session.pinned_message_id:
-        await MessageService.unpin_message_safe(bot, CHAT_ID, session.pinned_message_id)
-        await MessageService.delete_message_safe(bot, CHAT_ID, session.pinned_message_id)
-    
-    # Delete previous list message if exists
-    if session.list_message_id:
-        await MessageService.delete_message_safe(bot, CHAT_ID, session.list_message_id)
-        await SessionService.update_list_message_id(session.id, None)
-        SessionService.invalidate_cache(CHAT_ID)
+    old_pinned_id = session.pinned_message_id
+    if old_pinned_id:
+        await MessageService.unpin_message_safe(bot, CHAT_ID, old_pinned_id)
     
     # Send new message with buttons
     message = await bot.send_message(
@@ -50,7 +44,9 @@ async def send_daily_notification(bot: Bot) -> None:
     except Exception:
         pass  # Ignore if no permissions to pin
     
-    await MessageService.ensure_list_message(bot, session)
+    # Previous pinned message (with buttons) goes with the list messages in one request;
+    # the list is sent anew below the prompt inside the session actor
+    await MessageService.repost_list_message(bot, session, [old_pinned_id] if old_pinned_id else [])
 
 
 async def close_current_session(bot: Bot) -> None:
@@ -66,13 +62,30 @@ async def close_current_session(bot: Bot) -> None:
         await MessageService.unpin_message_safe(bot, CHAT_ID, session.pinned_message_id)
     
     await SessionService.close_session(session.id)
-    SessionService.invalidate_cache(CHAT_ID)
     
     msg = await bot.send_message(chat_id=CHAT_ID, text="Сессия закрыта.")
     # Удаляем сообщение через 3 секунды
     MessageService.schedule_delete(bot, CHAT_ID, msg.message_id, delay=3)
 
 
+async def archive_closed_sessions() -> None:
+    """Archive responses of closed sessions whose retention period has passed."""
+    SCHEDULER_JOBS_TOTAL.labels(job="archive_sessions").inc()
+    await SessionService.archive_closed_sessions()
+
+
+async def run_db_maintenance() -> None:
+    """Checkpoint WAL, refresh planner statistics and reclaim free pages."""
+    SCHEDULER_JOBS_TOTAL.labels(job="db_maintenance").inc()
+    await get_storage().run_maintenance()
+
+
+async def backup_database() -> None:
+    """Take an online database snapshot and drop the oldest ones."""
+    SCHEDULER_JOBS_TOTAL.labels(job="db_backup").inc()
+    await get_storage().create_backup()
+
+
 def setup_scheduler(bot: Bot) -> AsyncIOScheduler:
     """Set up and return the scheduler with all jobs."""
     scheduler = AsyncIOScheduler(timezone=TIMEZONE)
@@ -90,4 +103,16 @@ def setup_scheduler(bot: Bot) -> AsyncIOScheduler:
     close_trigger = CronTrigger(day_of_week="wed", hour=23, minute=30)
     scheduler.add_job(close_current_session, close_trigger, args=[bot])
     
+    # Archive closed sessions nightly (picks up sessions kept for ARCHIVE_RETENTION_HOURS)
+    archive_trigger = CronTrigger(hour=4, minute=0)
+    scheduler.add_job(archive_closed_sessions, archive_trigger)
+    
+    # Database maintenance on Thursday night, after the session is closed and archived
+    maintenance_trigger = CronTrigger(day_of_week="thu", hour=4, minute=30)
+    scheduler.add_job(run_db_maintenance, maintenance_trigger)
+    
+    # Nightly snapshot after archiving and maintenance
+    backup_trigger = CronTrigger(hour=5, minute=0)
+    scheduler.add_job(backup_database, backup_trigger)
+    
     return scheduler
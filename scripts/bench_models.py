@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Microbenchmark of response row mapping: per-row from_row with name lookups vs bulk from_rows.
+
+    python scripts/bench_models.py
+
+The "per-row" column reproduces the previous mapping (a plain dataclass, one
+row.keys() call and an `in` check per optional field); memory is the size of
+the resulting list of models measured with tracemalloc.
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import timeit
+import tracemalloc
+from dataclasses import dataclass
+from typing import Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from models import Response, ResponseStatus  # noqa: E402
+from utils import TEAM_EMOJI, utc_now_us  # noqa: E402
+
+SIZES = [20, 100, 1_000, 10_000]
+
+
+@dataclass
+class LegacyResponse:
+    session_id: int
+    chat_id: int
+    user_id: int
+    last_name: str
+    status: ResponseStatus
+    team: Optional[str] = None
+    is_goalie: bool = False
+    updated_at_us: int = 0
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(
+            session_id=row["session_id"] if "session_id" in row.keys() else 0,
+            chat_id=row["chat_id"] if "chat_id" in row.keys() else 0,
+            user_id=row["user_id"],
+            last_name=row["last_name"],
+            status=ResponseStatus(row["status"]),
+            team=row["team"] if "team" in row.keys() else None,
+            is_goalie=bool(row["is_goalie"]) if "is_goalie" in row.keys() and row["is_goalie"] else False,
+            updated_at_us=row["updated_at"] if row["updated_at"] else utc_now_us()
+        )
+
+
+def make_rows(count):
+    """Rows shaped like db.fetch_responses: sqlite3.Row of the covering-index query."""
+    rng = random.Random(count)
+    teams = [*TEAM_EMOJI, None]
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute(
+        "CREATE TABLE responses (user_id INTEGER, last_name TEXT, status TEXT, team TEXT, is_goalie INTEGER, updated_at INTEGER)"
+    )
+    conn.executemany(
+        "INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            (idx, f"Игрок{idx}", rng.choice(ResponseStatus.all()), rng.choice(teams), int(rng.random() < 0.05), idx + 1)
+            for idx in range(count)
+        ],
+    )
+    rows = conn.execute(
+        "SELECT user_id, last_name, status, team, is_goalie, updated_at FROM responses ORDER BY updated_at"
+    ).fetchall()
+    conn.close()
+    return rows
+
+
+def measure_memory(build):
+    tracemalloc.start()
+    models = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del models
+    return size
+
+
+def main():
+    print(f"{'rows':>7} {'per-row, ms':>12} {'from_rows, ms':>14} {'speedup':>8} {'per-row, KiB':>13} {'slotted, KiB':>13}")
+    for size in SIZES:
+        rows = make_rows(size)
+        number = max(1, 20_000 // size)
+
+        def legacy():
+            return [LegacyResponse.from_row(row) for row in rows]
+
+        def bulk():
+            return Response.from_rows(rows)
+
+        legacy_time = min(timeit.repeat(legacy, number=number, repeat=5)) / number
+        bulk_time = min(timeit.repeat(bulk, number=number, repeat=5)) / number
+        print(
+            f"{size:>7} {legacy_time * 1000:>12.3f} {bulk_time * 1000:>14.3f} {legacy_time / bulk_time:>7.1f}x"
+            f" {measure_memory(legacy) / 1024:>13.1f} {measure_memory(bulk) / 1024:>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
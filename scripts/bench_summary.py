@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Microbenchmark of the summary renderer: time per player from 20 to 10,000 players.
+
+    python scripts/bench_summary.py
+"""
+
+import os
+import random
+import sys
+import timeit
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from models import PlayerInfo  # noqa: E402
+from utils import TEAM_EMOJI, render_summary  # noqa: E402
+
+SIZES = [20, 100, 1_000, 10_000]
+TARGET_DATE = date(2026, 1, 28)
+
+
+def make_players(count):
+    rng = random.Random(count)
+    teams = [*TEAM_EMOJI, None]
+    return [
+        PlayerInfo(
+            last_name=f"Игрок{idx}",
+            team=rng.choice(teams),
+            status=rng.choice(["YES", "YES", "MAYBE", "NO"]),
+            is_goalie=rng.random() < 0.05,
+        )
+        for idx in range(count)
+    ]
+
+
+def main():
+    print(f"{'players':>8} {'render, ms':>11} {'per player, us':>15}")
+    for size in SIZES:
+        players = make_players(size)
+        number = max(1, 20_000 // size)
+        best = min(timeit.repeat(lambda: render_summary(TARGET_DATE, players), number=number, repeat=5)) / number
+        print(f"{size:>8} {best * 1000:>11.3f} {best / size * 1_000_000:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
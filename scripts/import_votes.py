@@ -2,7 +2,7 @@
 """Script to import voting data into the database."""
 
 import sqlite3
-from datetime import datetime
+import time
 
 DB_PATH = "/opt/wed-bobry-bot/data/data.db"
 CHAT_ID = -1003689265922
@@ -22,6 +22,11 @@ NO_VOTERS = [
     "Быченков", "Бойцов", "Семенов"
 ]
 
+def normalize_last_name(last_name):
+    """Same key as utils.normalize_last_name (the script runs without the bot's modules)."""
+    return " ".join(last_name.split()).casefold().replace("ё", "е")
+
+
 def main():
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
@@ -50,7 +55,8 @@ def main():
         session_id = cursor.lastrowid
         print(f"✅ Created new session: id={session_id}")
     
-    now = datetime.utcnow().isoformat()
+    # updated_at хранится в микросекундах UTC от эпохи
+    now = time.time_ns() // 1000
     
     # Insert votes using negative user_ids as placeholders
     user_id_counter = -1
@@ -75,9 +81,9 @@ def main():
                 print(f"  Updated: {last_name} -> {status}")
             else:
                 cursor.execute(
-                    """INSERT INTO responses (session_id, chat_id, user_id, last_name, status, updated_at)
-                       VALUES (?, ?, ?, ?, ?, ?)""",
-                    (session_id, CHAT_ID, user_id_counter, last_name, status, now)
+                    """INSERT INTO responses (session_id, chat_id, user_id, last_name, name_key, status, updated_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                    (session_id, CHAT_ID, user_id_counter, last_name, normalize_last_name(last_name), status, now)
                 )
                 print(f"  Inserted: {last_name} -> {status} (user_id={user_id_counter})")
                 user_id_counter -= 1
@@ -11,61 +11,84 @@ INSERT OR IGNORE INTO sessions (chat_id, target_date, is_closed)
 VALUES (-1003689265922, '2026-01-28', 0);
 
 -- Get the session_id (we'll use a subquery)
+-- updated_at хранится целыми микросекундами UTC от эпохи (как в import_votes.py)
+-- name_key = utils.normalize_last_name(last_name) записан литералом: LOWER() в SQLite
+-- не переводит кириллицу в нижний регистр
+-- Upsert, а не INSERT OR REPLACE: REPLACE удаляет строку без DELETE-триггера,
+-- и счётчики session_counts расходятся с ответами
 -- Insert YES votes
-INSERT OR REPLACE INTO responses (session_id, chat_id, user_id, last_name, status, updated_at)
+INSERT INTO responses (session_id, chat_id, user_id, last_name, name_key, status, updated_at)
 SELECT 
     (SELECT id FROM sessions WHERE chat_id = -1003689265922 AND target_date = '2026-01-28'),
     -1003689265922,
     user_id,
     last_name,
+    name_key,
     'YES',
-    datetime('now')
+    CAST((julianday('now') - 2440587.5) * 86400000000 AS INTEGER)
 FROM (
-    SELECT -1 as user_id, 'Черчинцев' as last_name UNION ALL
-    SELECT -2, 'Антонцев' UNION ALL
-    SELECT -3, 'Пономарь' UNION ALL
-    SELECT -4, 'Лычагин' UNION ALL
-    SELECT -5, 'Шевцов' UNION ALL
-    SELECT -6, 'Яворовский' UNION ALL
-    SELECT -7, 'Полещук' UNION ALL
-    SELECT -8, 'Ровдо' UNION ALL
-    SELECT -9, 'Гречаниченко' UNION ALL
-    SELECT -10, 'Чих' UNION ALL
-    SELECT -11, 'Тамразов'
-);
+    SELECT -1 as user_id, 'Черчинцев' as last_name, 'черчинцев' as name_key UNION ALL
+    SELECT -2, 'Антонцев', 'антонцев' UNION ALL
+    SELECT -3, 'Пономарь', 'пономарь' UNION ALL
+    SELECT -4, 'Лычагин', 'лычагин' UNION ALL
+    SELECT -5, 'Шевцов', 'шевцов' UNION ALL
+    SELECT -6, 'Яворовский', 'яворовский' UNION ALL
+    SELECT -7, 'Полещук', 'полещук' UNION ALL
+    SELECT -8, 'Ровдо', 'ровдо' UNION ALL
+    SELECT -9, 'Гречаниченко', 'гречаниченко' UNION ALL
+    SELECT -10, 'Чих', 'чих' UNION ALL
+    SELECT -11, 'Тамразов', 'тамразов'
+)
+-- WHERE нужен парсеру SQLite для upsert после SELECT
+WHERE true
+ON CONFLICT(session_id, user_id) DO UPDATE SET
+    status = excluded.status,
+    updated_at = excluded.updated_at;
 
 -- Insert MAYBE votes
-INSERT OR REPLACE INTO responses (session_id, chat_id, user_id, last_name, status, updated_at)
+INSERT INTO responses (session_id, chat_id, user_id, last_name, name_key, status, updated_at)
 SELECT 
     (SELECT id FROM sessions WHERE chat_id = -1003689265922 AND target_date = '2026-01-28'),
     -1003689265922,
     user_id,
     last_name,
+    name_key,
     'MAYBE',
-    datetime('now')
+    CAST((julianday('now') - 2440587.5) * 86400000000 AS INTEGER)
 FROM (
-    SELECT -12 as user_id, 'Чикинев' as last_name UNION ALL
-    SELECT -13, 'Массовец' UNION ALL
-    SELECT -14, 'Козлов' UNION ALL
-    SELECT -15, 'Пикунов' UNION ALL
-    SELECT -16, 'Морозов' UNION ALL
-    SELECT -17, 'Помазенков'
-);
+    SELECT -12 as user_id, 'Чикинев' as last_name, 'чикинев' as name_key UNION ALL
+    SELECT -13, 'Массовец', 'массовец' UNION ALL
+    SELECT -14, 'Козлов', 'козлов' UNION ALL
+    SELECT -15, 'Пикунов', 'пикунов' UNION ALL
+    SELECT -16, 'Морозов', 'морозов' UNION ALL
+    SELECT -17, 'Помазенков', 'помазенков'
+)
+-- WHERE нужен парсеру SQLite для upsert после SELECT
+WHERE true
+ON CONFLICT(session_id, user_id) DO UPDATE SET
+    status = excluded.status,
+    updated_at = excluded.updated_at;
 
 -- Insert NO votes
-INSERT OR REPLACE INTO responses (session_id, chat_id, user_id, last_name, status, updated_at)
+INSERT INTO responses (session_id, chat_id, user_id, last_name, name_key, status, updated_at)
 SELECT 
     (SELECT id FROM sessions WHERE chat_id = -1003689265922 AND target_date = '2026-01-28'),
     -1003689265922,
     user_id,
     last_name,
+    name_key,
     'NO',
-    datetime('now')
+    CAST((julianday('now') - 2440587.5) * 86400000000 AS INTEGER)
 FROM (
-    SELECT -18 as user_id, 'Быченков' as last_name UNION ALL
-    SELECT -19, 'Бойцов' UNION ALL
-    SELECT -20, 'Семенов'
-);
+    SELECT -18 as user_id, 'Быченков' as last_name, 'быченков' as name_key UNION ALL
+    SELECT -19, 'Бойцов', 'бойцов' UNION ALL
+    SELECT -20, 'Семенов', 'семенов'
+)
+-- WHERE нужен парсеру SQLite для upsert после SELECT
+WHERE true
+ON CONFLICT(session_id, user_id) DO UPDATE SET
+    status = excluded.status,
+    updated_at = excluded.updated_at;
 
 -- Verify the import
 SELECT 'Session:' as info;
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Script to list database snapshots and restore one of them.
+
+Остановите бота перед восстановлением (docker compose stop wed-bobry-bot):
+иначе он продолжит писать в старую базу.
+
+    python scripts/restore_backup.py --list
+    python scripts/restore_backup.py latest
+    python scripts/restore_backup.py data/backups/data-20260129-050000.db
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+
+# Те же переменные окружения и умолчания, что и в config.py бота
+DB_PATH = os.getenv("DB_PATH", os.path.join("data", "data.db"))
+BACKUP_DIR = os.getenv("BACKUP_DIR")
+
+
+def default_backup_dir(db_path):
+    """Каталог снимков бота: BACKUP_DIR или backups/ рядом с базой."""
+    return BACKUP_DIR or os.path.join(os.path.dirname(db_path), "backups")
+
+
+def list_backups(backup_dir):
+    if not os.path.isdir(backup_dir):
+        return []
+    names = [n for n in os.listdir(backup_dir) if n.startswith("data-") and n.endswith(".db")]
+    return [os.path.join(backup_dir, n) for n in sorted(names, reverse=True)]
+
+
+def restore(snapshot, db_path):
+    # Проверяем снимок до того, как трогать рабочую базу
+    source = sqlite3.connect(f"file:{snapshot}?mode=ro", uri=True)
+    result = source.execute("PRAGMA integrity_check").fetchone()[0]
+    if result != "ok":
+        source.close()
+        sys.exit(f"❌ Snapshot {snapshot} failed integrity check: {result}")
+
+    # Backup API переписывает базу целиком, включая WAL, — копировать файлы вручную не нужно
+    target = sqlite3.connect(db_path)
+    source.backup(target)
+    target.close()
+    source.close()
+    print(f"✅ Restored {db_path} from {snapshot}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Restore the bot database from a snapshot.")
+    parser.add_argument("snapshot", nargs="?", help="Snapshot path or 'latest'")
+    parser.add_argument("--list", action="store_true", help="List available snapshots")
+    parser.add_argument("--db", default=DB_PATH, help="Database to restore into")
+    parser.add_argument("--backup-dir", help="Directory with snapshots (default: backups/ next to --db)")
+    args = parser.parse_args()
+    args.backup_dir = args.backup_dir or default_backup_dir(args.db)
+
+    backups = list_backups(args.backup_dir)
+    if args.list or not args.snapshot:
+        if not backups:
+            print(f"No snapshots in {args.backup_dir}")
+        for path in backups:
+            print(f"{path}  {os.path.getsize(path)} bytes")
+        return
+
+    snapshot = args.snapshot
+    if snapshot == "latest":
+        if not backups:
+            sys.exit(f"❌ No snapshots in {args.backup_dir}")
+        snapshot = backups[0]
+    if not os.path.exists(snapshot):
+        sys.exit(f"❌ Snapshot not found: {snapshot}")
+
+    restore(snapshot, args.db)
+
+
+if __name__ == "__main__":
+    main()
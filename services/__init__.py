@@ -1,5 +1,8 @@
 """Services layer for business logic."""
+from services.admin_directory import AdminDirectory
+from services.deletion_scheduler import DeletionScheduler
+from services.session_actor import SessionActor
 from services.session_service import SessionService
 from services.message_service import MessageService
 
-__all__ = ["SessionService", "MessageService"]
+__all__ = ["AdminDirectory", "DeletionScheduler", "SessionActor", "SessionService", "MessageService"]
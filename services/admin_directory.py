@@ -0,0 +1,106 @@
+"""In-memory directory of chat administrators."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.enums import ChatMemberStatus
+from aiogram.types import ChatMemberUpdated
+
+from config import ADMIN_CACHE_TTL, ADMIN_IDS
+from metrics import ADMIN_DIRECTORY_REFRESHES_TOTAL, ADMIN_DIRECTORY_STALE_READS_TOTAL
+
+
+_ADMIN_STATUSES = {ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.CREATOR}
+# После неудачной перезагрузки следующая попытка — не раньше чем через N секунд
+_RETRY_AFTER_ERROR = 60
+
+
+class AdminDirectory:
+    """Administrators of each chat, answered from memory.
+
+    A chat's list is loaded with one getChatAdministrators call and reloaded
+    in the background once older than ADMIN_CACHE_TTL; until then the previous
+    list keeps answering (a stale read). chat_member updates promote or demote
+    a user right away. Users from ADMIN_IDS are admins in every chat.
+    """
+
+    _admins: dict[int, set[int]] = {}
+    _loaded_at: dict[int, float] = {}
+    _refreshes: dict[int, asyncio.Task] = {}
+
+    @classmethod
+    async def is_admin(cls, bot: Bot, chat_id: int, user_id: int) -> bool:
+        """Check if user is admin in the chat."""
+        if user_id in ADMIN_IDS:
+            return True
+        admins = cls._admins.get(chat_id)
+        if admins is None:
+            admins = await cls.refresh(bot, chat_id)
+            if admins is None:
+                return await cls._check_member(bot, chat_id, user_id)
+        elif time.monotonic() - cls._loaded_at.get(chat_id, 0.0) > ADMIN_CACHE_TTL:
+            ADMIN_DIRECTORY_STALE_READS_TOTAL.inc()
+            cls._start_refresh(bot, chat_id)
+        return user_id in admins
+
+    @classmethod
+    async def refresh(cls, bot: Bot, chat_id: int) -> Optional[set[int]]:
+        """Reload the chat's administrators (concurrent callers share one request); None on failure."""
+        return await asyncio.shield(cls._start_refresh(bot, chat_id))
+
+    @classmethod
+    def apply_member_update(cls, event: ChatMemberUpdated) -> None:
+        """Promote or demote the member of a chat_member update."""
+        admins = cls._admins.get(event.chat.id)
+        if admins is None:
+            return  # Список загрузится целиком при первой проверке
+        user_id = event.new_chat_member.user.id
+        if event.new_chat_member.status in _ADMIN_STATUSES:
+            admins.add(user_id)
+        else:
+            admins.discard(user_id)
+
+    @classmethod
+    def invalidate(cls, chat_id: int) -> None:
+        """Forget the chat's list; the next check reloads it."""
+        cls._admins.pop(chat_id, None)
+        cls._loaded_at.pop(chat_id, None)
+
+    @classmethod
+    def _start_refresh(cls, bot: Bot, chat_id: int) -> asyncio.Task:
+        task = cls._refreshes.get(chat_id)
+        if task is None or task.done():
+            task = asyncio.create_task(cls._load(bot, chat_id))
+            cls._refreshes[chat_id] = task
+        return task
+
+    @classmethod
+    async def _load(cls, bot: Bot, chat_id: int) -> Optional[set[int]]:
+        try:
+            members = await bot.get_chat_administrators(chat_id)
+        except Exception as e:
+            ADMIN_DIRECTORY_REFRESHES_TOTAL.labels(result="error").inc()
+            logging.warning(f"Failed to load administrators of chat {chat_id}: {e}")
+            if chat_id in cls._admins:
+                # Старый список продолжает отвечать, повтор — позже
+                cls._loaded_at[chat_id] = time.monotonic() - ADMIN_CACHE_TTL + _RETRY_AFTER_ERROR
+            return None
+        admins = {member.user.id for member in members}
+        cls._admins[chat_id] = admins
+        cls._loaded_at[chat_id] = time.monotonic()
+        ADMIN_DIRECTORY_REFRESHES_TOTAL.labels(result="ok").inc()
+        return admins
+
+    @classmethod
+    async def _check_member(cls, bot: Bot, chat_id: int, user_id: int) -> bool:
+        """Single getChatMember lookup while the chat's list cannot be loaded."""
+        try:
+            member = await bot.get_chat_member(chat_id, user_id)
+            return member.status in _ADMIN_STATUSES
+        except Exception as e:
+            logging.warning(f"Failed to check admin status: {e}")
+            return False
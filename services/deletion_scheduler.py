@@ -0,0 +1,183 @@
+"""Single scheduler for delayed message deletions."""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+from typing import Optional
+
+from aiogram import Bot
+
+from config import DELETE_BATCH_WINDOW_MS
+from metrics import DELETE_BATCH_SIZE, DELETION_LATENESS_SECONDS, PENDING_DELETIONS
+from storage import get_storage
+from utils import utc_now_us
+
+
+Key = tuple[int, int]  # (chat_id, message_id)
+
+# Лимит Bot API на число сообщений в одном deleteMessages
+_MAX_BULK_DELETE = 100
+
+
+class DeletionScheduler:
+    """Owns every pending deletion of prompts, confirmations and errors.
+
+    One task sleeps until the earliest deadline of a min-heap instead of one
+    sleeping task per message. Entries are persisted in pending_deletions, so
+    messages scheduled before a crash or restart are still removed.
+    """
+
+    _bot: Optional[Bot] = None
+    _task: Optional[asyncio.Task] = None
+    _wakeup = asyncio.Event()
+    # (due_at_us, chat_id, message_id); entries whose due_at differs from _due are stale
+    _heap: list[tuple[int, int, int]] = []
+    _due: dict[Key, int] = {}
+    # Changes not yet written to storage
+    _unsaved: dict[Key, int] = {}
+    _forgotten: set[Key] = set()
+
+    @classmethod
+    async def start(cls, bot: Bot) -> None:
+        """Replay persisted deletions and start the scheduler task."""
+        cls._bot = bot
+        for chat_id, message_id, due_at in await get_storage().fetch_pending_deletions():
+            if (chat_id, message_id) not in cls._due:
+                cls._push((chat_id, message_id), due_at)
+        if cls._due:
+            logging.info(f"Replaying {len(cls._due)} pending message deletions")
+        cls._ensure_running()
+
+    @classmethod
+    async def stop(cls) -> None:
+        """Stop the scheduler; pending deletions stay persisted for the next start."""
+        if cls._task is not None:
+            cls._task.cancel()
+            try:
+                await cls._task
+            except asyncio.CancelledError:
+                pass
+            cls._task = None
+        await cls._persist()
+
+    @classmethod
+    def schedule(cls, bot: Bot, chat_id: int, message_id: int, delay: float) -> None:
+        """Delete the message after delay seconds."""
+        cls._bot = cls._bot or bot
+        key = (chat_id, message_id)
+        due_at = utc_now_us() + int(delay * 1_000_000)
+        cls._push(key, due_at)
+        cls._unsaved[key] = due_at
+        cls._forgotten.discard(key)
+        cls._ensure_running()
+        cls._wakeup.set()
+
+    @classmethod
+    def cancel(cls, chat_id: int, message_id: int) -> bool:
+        """Cancel a pending deletion; True if it was scheduled."""
+        key = (chat_id, message_id)
+        if cls._due.pop(key, None) is None:
+            return False
+        cls._forget(key)
+        PENDING_DELETIONS.set(len(cls._due))
+        cls._wakeup.set()
+        return True
+
+    @classmethod
+    def _push(cls, key: Key, due_at: int) -> None:
+        cls._due[key] = due_at
+        heapq.heappush(cls._heap, (due_at, *key))
+        PENDING_DELETIONS.set(len(cls._due))
+
+    @classmethod
+    def _forget(cls, key: Key) -> None:
+        # Ещё не записанное удаление просто не пишем
+        if cls._unsaved.pop(key, None) is None:
+            cls._forgotten.add(key)
+
+    @classmethod
+    def _ensure_running(cls) -> None:
+        if cls._task is None or cls._task.done():
+            cls._task = asyncio.create_task(cls._run(), name="deletion-scheduler")
+
+    @classmethod
+    async def _persist(cls) -> None:
+        if not cls._unsaved and not cls._forgotten:
+            return
+        added = [(*key, due_at) for key, due_at in cls._unsaved.items()]
+        removed = list(cls._forgotten)
+        cls._unsaved.clear()
+        cls._forgotten.clear()
+        try:
+            await get_storage().save_pending_deletions(added, removed)
+        except Exception as e:
+            logging.warning(f"Failed to persist pending deletions: {e}")
+
+    @classmethod
+    def _pop_due(cls, now: int) -> list[tuple[Key, int]]:
+        """Remove and return all deletions due by now."""
+        due: list[tuple[Key, int]] = []
+        while cls._heap and cls._heap[0][0] <= now:
+            due_at, chat_id, message_id = heapq.heappop(cls._heap)
+            key = (chat_id, message_id)
+            if cls._due.get(key) != due_at:
+                continue  # Отменено или перенесено
+            del cls._due[key]
+            due.append((key, due_at))
+        PENDING_DELETIONS.set(len(cls._due))
+        return due
+
+    @classmethod
+    async def delete_now(cls, bot: Bot, chat_id: int, message_ids: list[int]) -> int:
+        """Delete messages of a chat via bulk deleteMessages; returns how many were deleted.
+        
+        If a bulk call fails, its messages are retried one by one so a single
+        undeletable message does not keep the others in the chat.
+        """
+        deleted = 0
+        for start in range(0, len(message_ids), _MAX_BULK_DELETE):
+            chunk = message_ids[start:start + _MAX_BULK_DELETE]
+            DELETE_BATCH_SIZE.observe(len(chunk))
+            if len(chunk) > 1:
+                try:
+                    await bot.delete_messages(chat_id, chunk)
+                    deleted += len(chunk)
+                    continue
+                except Exception as e:
+                    logging.debug(f"Bulk delete in chat {chat_id} failed, falling back to single deletes: {e}")
+            for message_id in chunk:
+                try:
+                    await bot.delete_message(chat_id, message_id)
+                    deleted += 1
+                except Exception:
+                    pass  # Ignore deletion errors (already deleted, too old, no rights)
+        return deleted
+
+    @classmethod
+    async def _run(cls) -> None:
+        while True:
+            cls._wakeup.clear()
+            now = utc_now_us()
+            # Удаления, наступающие в пределах окна, уходят одним запросом на чат
+            by_chat: dict[int, list[tuple[int, int]]] = {}
+            for (chat_id, message_id), due_at in cls._pop_due(now + DELETE_BATCH_WINDOW_MS * 1000):
+                by_chat.setdefault(chat_id, []).append((message_id, due_at))
+            for chat_id, entries in by_chat.items():
+                earliest_due = min(due_at for _, due_at in entries)
+                DELETION_LATENESS_SECONDS.set(max(0, utc_now_us() - earliest_due) / 1_000_000)
+                await cls.delete_now(cls._bot, chat_id, [message_id for message_id, _ in entries])
+                for message_id, _ in entries:
+                    cls._forget((chat_id, message_id))
+            await cls._persist()
+
+            # Спим до ближайшего срока или до нового/отменённого удаления
+            while cls._heap and cls._due.get((cls._heap[0][1], cls._heap[0][2])) != cls._heap[0][0]:
+                heapq.heappop(cls._heap)
+            timeout = (cls._heap[0][0] - utc_now_us()) / 1_000_000 if cls._heap else None
+            if timeout is not None and timeout <= 0:
+                continue
+            try:
+                await asyncio.wait_for(cls._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -3,35 +3,41 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from typing import Optional
+import time
+from typing import Optional, Sequence
 
 from aiogram import Bot
-from aiogram.exceptions import TelegramBadRequest
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
 
-from models import Session
+from config import SUMMARY_EDIT_INTERVAL_MS
+from metrics import LIST_EDITS_SKIPPED_TOTAL, SUMMARY_UPDATES_COALESCED_TOTAL
+from models import ListPage, Session
+from services.deletion_scheduler import DeletionScheduler
+from services.session_actor import SessionActor
 from services.session_service import SessionService
+from utils import text_digest
 
 
+# Ошибки правки, после которых страницы списка в чате больше нет
+_MISSING_PAGE_ERRORS = ("message to edit not found", "message can't be edited")
+# Повтор правки списка после прочих сбоев: пауза удваивается, попыток не больше N
+_EDIT_RETRY_DELAY = 2.0
+_EDIT_MAX_RETRIES = 5
+
 class MessageService:
     """Service for managing bot messages."""
     
     # Track last /start message per chat
     _last_start_messages: dict[int, int] = {}
     
-    @classmethod
-    async def delete_message_later(
-        cls,
-        bot: Bot,
-        chat_id: int,
-        message_id: int,
-        delay: int = 5
-    ) -> None:
-        """Delete a message after specified delay (in seconds)."""
-        await asyncio.sleep(delay)
-        try:
-            await bot.delete_message(chat_id, message_id)
-        except Exception:
-            pass  # Ignore deletion errors
+    # Coalescing summary editors: session_id -> latest requested session / editor task
+    _summary_pending: dict[int, Session] = {}
+    _summary_editors: dict[int, asyncio.Task] = {}
+    _summary_last_edit: dict[int, float] = {}
+    # Flood control: правка списка сессии не раньше этого момента (time.monotonic)
+    _summary_not_before: dict[int, float] = {}
+    _summary_failures: dict[int, int] = {}
+    _summary_flush = asyncio.Event()
     
     @classmethod
     def schedule_delete(
@@ -41,8 +47,13 @@ class MessageService:
         message_id: int,
         delay: int = 5
     ) -> None:
-        """Schedule message deletion as a background task."""
-        asyncio.create_task(cls.delete_message_later(bot, chat_id, message_id, delay))
+        """Schedule message deletion after specified delay (in seconds)."""
+        DeletionScheduler.schedule(bot, chat_id, message_id, delay)
+    
+    @classmethod
+    def cancel_delete(cls, chat_id: int, message_id: int) -> bool:
+        """Cancel a scheduled deletion, returning True if it was pending."""
+        return DeletionScheduler.cancel(chat_id, message_id)
     
     @classmethod
     async def delete_message_safe(cls, bot: Bot, chat_id: int, message_id: int) -> bool:
@@ -53,6 +64,11 @@ class MessageService:
         except Exception:
             return False
     
+    @classmethod
+    async def delete_messages_safe(cls, bot: Bot, chat_id: int, message_ids: list[int]) -> int:
+        """Safely delete several messages with one bulk request, returning how many were deleted."""
+        return await DeletionScheduler.delete_now(bot, chat_id, message_ids)
+    
     @classmethod
     async def unpin_message_safe(cls, bot: Bot, chat_id: int, message_id: int) -> bool:
         """Safely unpin a message, returning True if successful."""
@@ -75,36 +91,212 @@ class MessageService:
     @classmethod
     async def ensure_list_message(cls, bot: Bot, session: Session) -> None:
         """Ensure list message exists and is up-to-date."""
-        text = await SessionService.format_summary_text(session)
+        try:
+            await SessionActor.submit(session.id, lambda: cls._ensure_list_message(bot, session))
+        except TelegramRetryAfter as e:
+            logging.warning(f"Flood control on the list of session {session.id}, retry in {e.retry_after}s")
+            cls._defer_summary(bot, session, e.retry_after)
+    
+    @classmethod
+    async def _ensure_list_message(cls, bot: Bot, session: Session) -> None:
+        """Edit or send the list messages; runs inside the session actor.
         
-        if session.list_message_id:
-            try:
-                await bot.edit_message_text(
-                    text=text,
-                    chat_id=session.chat_id,
-                    message_id=session.list_message_id,
-                )
-                return
-            except TelegramBadRequest as e:
-                if "message is not modified" in str(e):
-                    return
-                logging.warning(f"Failed to edit message {session.list_message_id}: {e}")
-            except Exception as e:
-                logging.warning(f"Failed to edit message {session.list_message_id}: {e}")
+        The list is laid out across pages split between blocks; a page is
+        edited only if its text changed, extra pages are sent after the last
+        one and pages no longer needed are deleted.
+        """
+        expected = session.list_pages
+        texts = await SessionService.format_summary_pages(session)
+        old_pages = expected
+        new_pages: list[ListPage] = []
+        try:
+            for number, text in enumerate(texts):
+                text_hash = text_digest(text)
+                if number < len(old_pages):
+                    page = old_pages[number]
+                    # The message already shows exactly this text: skip the round trip
+                    if page.text_hash == text_hash:
+                        LIST_EDITS_SKIPPED_TOTAL.inc()
+                        new_pages.append(page)
+                        continue
+                    if await cls._edit_list_page(bot, session.chat_id, page.message_id, text):
+                        new_pages.append(ListPage(page.message_id, text_hash))
+                        continue
+                    # Страница пропала — остальные отправляются заново, чтобы сохранить порядок
+                    await cls.delete_messages_safe(
+                        bot, session.chat_id, [page.message_id for page in old_pages[number:]]
+                    )
+                    old_pages = old_pages[:number]
+                message = await bot.send_message(chat_id=session.chat_id, text=text)
+                new_pages.append(ListPage(message.message_id, text_hash))
+        except Exception:
+            # Remember what is already in the chat, so the next attempt edits it
+            await cls._save_list_pages(bot, session, expected, new_pages + old_pages[len(new_pages):])
+            raise
         
-        # Create new list message
-        message = await bot.send_message(chat_id=session.chat_id, text=text)
-        await SessionService.update_list_message_id(session.id, message.message_id)
-        session.list_message_id = message.message_id
+        surplus = [page.message_id for page in old_pages[len(new_pages):]]
+        if surplus:
+            await cls.delete_messages_safe(bot, session.chat_id, surplus)
+        await cls._save_list_pages(bot, session, expected, new_pages)
     
     @classmethod
-    async def update_summary(cls, bot: Bot, session: Session) -> None:
-        """Update summary message with fresh data from DB."""
-        from db import get_session_by_date
+    async def _edit_list_page(cls, bot: Bot, chat_id: int, message_id: int, text: str) -> bool:
+        """Edit one list message; False if it is gone from the chat.
+        
+        Other errors (flood control, network, other bad requests) propagate:
+        the page is still there and the summary editor retries the edit later.
+        """
+        try:
+            await bot.edit_message_text(text=text, chat_id=chat_id, message_id=message_id)
+        except TelegramBadRequest as e:
+            if "message is not modified" in str(e):
+                return True
+            if not any(reason in str(e) for reason in _MISSING_PAGE_ERRORS):
+                raise
+            logging.warning(f"List message {message_id} is gone: {e}")
+            return False
+        return True
+    
+    @classmethod
+    async def _save_list_pages(
+        cls,
+        bot: Bot,
+        session: Session,
+        expected: list[ListPage],
+        pages: list[ListPage],
+    ) -> None:
+        """Store pages unless the session's pages changed since expected was read.
+        
+        Every write replaces the list object, so an identity check catches a
+        concurrent change; the messages sent by the lost write are deleted.
+        """
+        if session.list_pages is not expected:
+            logging.warning(f"List pages of session {session.id} changed during the update, dropping it")
+            kept = {page.message_id for page in expected} | set(session.list_message_ids)
+            sent = [page.message_id for page in pages if page.message_id not in kept]
+            if sent:
+                await cls.delete_messages_safe(bot, session.chat_id, sent)
+            return
+        if pages != expected:
+            await SessionService.update_list_pages(session.id, pages)
+            session.list_pages = pages
+    
+    @classmethod
+    async def repost_list_message(cls, bot: Bot, session: Session, stale_ids: Sequence[int] = ()) -> None:
+        """Delete the list messages and send the list anew below the latest messages.
         
-        # Reload session from DB to get current list_message_id
-        fresh_session = await get_session_by_date(session.chat_id, session.target_date)
-        if fresh_session and not fresh_session["is_closed"]:
-            session = Session.from_row(fresh_session)
+        stale_ids are other messages of the session's chat removed in the same
+        request. Deleting and sending is one actor command, so a summary edit in
+        flight cannot write the deleted pages back.
+        """
+        async def command() -> None:
+            current = SessionService.get_cached_session(session.id) or session
+            stale = [*stale_ids, *current.list_message_ids]
+            if stale:
+                await cls.delete_messages_safe(bot, current.chat_id, stale)
+            if current.list_pages:
+                await SessionService.update_list_pages(current.id, [])
+                current.list_pages = []
+            await cls._ensure_list_message(bot, current)
+        
+        try:
+            await SessionActor.submit(session.id, command)
+        except TelegramRetryAfter as e:
+            logging.warning(f"Flood control on the list of session {session.id}, retry in {e.retry_after}s")
+            cls._defer_summary(bot, session, e.retry_after)
+    
+    @classmethod
+    async def delete_list_and_close(cls, bot: Bot, session: Session) -> None:
+        """Delete the list messages and close the session as one actor command."""
+        async def command() -> None:
+            current = SessionService.get_cached_session(session.id) or session
+            if current.list_pages:
+                await cls.delete_messages_safe(bot, current.chat_id, current.list_message_ids)
+            await SessionService.close_session(current.id)
+        
+        await SessionActor.submit(session.id, command)
+    
+    @classmethod
+    async def update_summary(cls, bot: Bot, session: Session) -> None:
+        """Request a summary refresh; edits are coalesced per list message.
         
-        await cls.ensure_list_message(bot, session)
+        The list is edited at most once per SUMMARY_EDIT_INTERVAL_MS and always
+        with the state at edit time, so a burst of votes ends in one final edit.
+        """
+        if session.id in cls._summary_pending:
+            SUMMARY_UPDATES_COALESCED_TOTAL.inc()
+        cls._summary_pending[session.id] = session
+        if session.id not in cls._summary_editors:
+            cls._summary_editors[session.id] = asyncio.create_task(cls._summary_editor(bot, session.id))
+    
+    @classmethod
+    def _defer_summary(cls, bot: Bot, session: Session, delay: float) -> None:
+        """Retry the list update in delay seconds; the wait happens outside the actor."""
+        cls._summary_not_before[session.id] = time.monotonic() + delay
+        cls._summary_pending.setdefault(session.id, session)
+        if session.id not in cls._summary_editors:
+            cls._summary_editors[session.id] = asyncio.create_task(cls._summary_editor(bot, session.id))
+    
+    @classmethod
+    async def flush_summaries(cls) -> None:
+        """Apply pending summary edits immediately (on shutdown)."""
+        cls._summary_flush.set()
+        try:
+            await asyncio.gather(*cls._summary_editors.values(), return_exceptions=True)
+        finally:
+            cls._summary_flush.clear()
+    
+    @classmethod
+    async def _summary_editor(cls, bot: Bot, session_id: int) -> None:
+        """Background editor of one session's list message."""
+        interval = SUMMARY_EDIT_INTERVAL_MS / 1000
+        try:
+            while session_id in cls._summary_pending:
+                due = max(
+                    cls._summary_last_edit.get(session_id, 0.0) + interval,
+                    cls._summary_not_before.get(session_id, 0.0),
+                )
+                delay = due - time.monotonic()
+                if delay > 0 and not cls._summary_flush.is_set():
+                    try:
+                        await asyncio.wait_for(cls._summary_flush.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                session = cls._summary_pending.pop(session_id)
+                cls._summary_last_edit[session_id] = time.monotonic()
+                try:
+                    await SessionActor.submit(session_id, lambda: cls._refresh_summary(bot, session))
+                except TelegramRetryAfter as e:
+                    if cls._summary_flush.is_set():
+                        logging.warning(f"Failed to update summary of session {session_id}: {e}")
+                    else:
+                        logging.warning(f"Flood control on the list of session {session_id}, retry in {e.retry_after}s")
+                        cls._defer_summary(bot, session, e.retry_after)
+                except Exception as e:
+                    failures = cls._summary_failures.get(session_id, 0) + 1
+                    if cls._summary_flush.is_set() or failures > _EDIT_MAX_RETRIES:
+                        cls._summary_failures.pop(session_id, None)
+                        logging.warning(f"Failed to update summary of session {session_id}: {e}")
+                    else:
+                        cls._summary_failures[session_id] = failures
+                        delay = _EDIT_RETRY_DELAY * 2 ** (failures - 1)
+                        logging.warning(f"Failed to update summary of session {session_id}, retry in {delay}s: {e}")
+                        cls._defer_summary(bot, session, delay)
+                else:
+                    cls._summary_failures.pop(session_id, None)
+        finally:
+            cls._summary_editors.pop(session_id, None)
+    
+    @classmethod
+    async def _refresh_summary(cls, bot: Bot, session: Session) -> None:
+        """Re-render and edit the list message; runs inside the session actor."""
+        # SessionService tracks list/pinned ids of the cached session, including ones set
+        # by earlier commands of this actor, so no reload from storage is needed
+        current = SessionService.get_cached_session(session.id)
+        if current is None:
+            current = await SessionService.get_or_create_session(session.chat_id)
+            if current.id != session.id:
+                return  # Сессия уже сменилась
+        if current.is_closed:
+            return  # Список закрытой сессии остаётся в финальном виде
+        await cls._ensure_list_message(bot, current)
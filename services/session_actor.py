@@ -0,0 +1,104 @@
+"""Per-session actor serializing mutations and list-message I/O."""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from metrics import SESSION_ACTOR_QUEUE_DEPTH, SESSION_ACTOR_WAIT
+
+
+Command = Callable[[], Awaitable[Any]]
+
+# Актор, в worker-е которого выполняется текущая команда (для вложенных вызовов)
+_current_actor: contextvars.ContextVar[Optional[SessionActor]] = contextvars.ContextVar(
+    "current_session_actor", default=None
+)
+
+
+class SessionActor:
+    """Single worker owning all writes and list-message updates of one session.
+
+    Handlers submit commands and await their results; commands of a session run
+    strictly one after another in submission order, so concurrent clicks can no
+    longer interleave between reading the list message ids and sending a new list.
+    """
+
+    _actors: dict[int, SessionActor] = {}
+    # Остановленные сессии -> worker, дорабатывающий их очередь (None, если актора не было)
+    _stopped: dict[int, Optional[asyncio.Task]] = {}
+
+    def __init__(self, session_id: int) -> None:
+        self.session_id = session_id
+        self._queue: asyncio.Queue[Optional[tuple[Command, asyncio.Future, float]]] = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run(), name=f"session-actor-{session_id}")
+
+    @classmethod
+    async def submit(cls, session_id: int, command: Command) -> Any:
+        """Run command in the session's actor and return its result."""
+        actor = _current_actor.get()
+        if actor is not None and actor.session_id == session_id:
+            # Команда вызвана из другой команды этого же актора — очередь её не дождётся
+            return await command()
+
+        if session_id in cls._stopped:
+            # Актор сессии остановлен: новый не создаём, иначе его worker никто не остановит
+            # и у сессии станет два worker-а; команда выполняется на месте после очереди старого
+            worker = cls._stopped[session_id]
+            if worker is not None and not worker.done():
+                await asyncio.wait({worker})
+            return await command()
+
+        actor = cls._actors.get(session_id)
+        if actor is None:
+            actor = cls._actors[session_id] = cls(session_id)
+
+        future = asyncio.get_running_loop().create_future()
+        actor._queue.put_nowait((command, future, time.perf_counter()))
+        SESSION_ACTOR_QUEUE_DEPTH.inc()
+        return await future
+
+    @classmethod
+    def stop(cls, session_id: int) -> None:
+        """Let the session's actor finish queued commands and exit.
+
+        Later submits for the session run inline once the queue is drained.
+        """
+        actor = cls._actors.pop(session_id, None)
+        if actor is None:
+            cls._stopped.setdefault(session_id, None)
+            return
+        cls._stopped[session_id] = actor._worker
+        actor._queue.put_nowait(None)
+
+    @classmethod
+    async def stop_all(cls) -> None:
+        """Drain and stop all actors (on shutdown)."""
+        actors = list(cls._actors.values())
+        for actor in actors:
+            cls.stop(actor.session_id)
+        await asyncio.gather(*(actor._worker for actor in actors), return_exceptions=True)
+
+    async def _run(self) -> None:
+        _current_actor.set(self)
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            command, future, enqueued_at = item
+            SESSION_ACTOR_QUEUE_DEPTH.dec()
+            SESSION_ACTOR_WAIT.observe(time.perf_counter() - enqueued_at)
+            if future.cancelled():
+                continue
+            try:
+                result = await command()
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+                else:
+                    logging.warning(f"Session {self.session_id} command failed: {e}")
+            else:
+                if not future.cancelled():
+                    future.set_result(result)
@@ -1,38 +1,100 @@
 """Session management service."""
 from __future__ import annotations
 
-import time
+import asyncio
+from collections import OrderedDict
 from datetime import date
 from typing import Optional
 
-from config import CHAT_ID, TIMEZONE
-from db import (
-    close_session,
-    create_session,
-    fetch_responses,
-    get_open_session,
-    get_session_by_date,
-    get_user_info,
-    get_user_last_name,
-    set_list_message_id,
-    set_pinned_message_id,
-    upsert_response,
-    upsert_user_info,
-    upsert_user_last_name,
-    delete_response_by_last_name,
-    update_response_team_by_last_name,
+from config import ARCHIVE_RETENTION_HOURS, CHAT_ID, LIST_PAGE_MAX_CHARS, TIMEZONE
+from models import ListPage, PlayerInfo, Response, ResponseStatus, Session, SessionSummary, User
+from services.session_actor import SessionActor
+from services.summary_composer import SummaryComposer
+from storage import get_storage
+from utils import (
+    get_now,
+    next_wednesday,
+    normalize_last_name,
+    render_summary_blocks,
+    split_summary_pages,
+    utc_now_us,
 )
-from models import PlayerInfo, Response, ResponseStatus, Session, SessionSummary
-from utils import format_summary_message, get_now, next_wednesday
+
+
+def _player_info(resp: Response) -> PlayerInfo:
+    return PlayerInfo(
+        last_name=resp.last_name,
+        team=resp.team,
+        status=resp.status.value,
+        is_goalie=resp.is_goalie
+    )
+
+
+class _Roster:
+    """Materialized responses of an open session, kept in updated_at order.
+
+    SQLite stays the durable store; the roster mirrors every write made through
+    SessionService, so rendering the summary needs no database reads. Once the
+    summary is rendered, mutations are also forwarded to a SummaryComposer so
+    the next render only redoes the blocks they touched.
+    """
+    
+    def __init__(self, responses: list[Response]) -> None:
+        # user_id -> Response; insertion order == order by (updated_at, user_id)
+        self._responses: OrderedDict[int, Response] = OrderedDict(
+            (resp.user_id, resp) for resp in responses
+        )
+        self._composer: Optional[SummaryComposer] = None
+    
+    def responses(self) -> list[Response]:
+        return list(self._responses.values())
+    
+    def summary_blocks(self, target_date: date) -> list[str]:
+        if self._composer is None:
+            self._composer = SummaryComposer(
+                (user_id, _player_info(resp)) for user_id, resp in self._responses.items()
+            )
+        return self._composer.render_blocks(target_date)
+    
+    def upsert(self, response: Response) -> None:
+        # Свежий updated_at — ответ уходит в конец списка
+        self._responses.pop(response.user_id, None)
+        self._responses[response.user_id] = response
+        if self._composer is not None:
+            self._composer.place(response.user_id, _player_info(response))
+    
+    def _find_by_name(self, last_name: str) -> list[Response]:
+        name_key = normalize_last_name(last_name)
+        return sorted(
+            (resp for resp in self._responses.values() if normalize_last_name(resp.last_name) == name_key),
+            key=lambda resp: resp.user_id,
+        )
+    
+    def delete_by_name(self, last_name: str) -> None:
+        for resp in self._find_by_name(last_name):
+            del self._responses[resp.user_id]
+            if self._composer is not None:
+                self._composer.remove(resp.user_id)
+    
+    def set_team_by_name(self, last_name: str, new_team: str) -> None:
+        now = utc_now_us()
+        for resp in self._find_by_name(last_name):
+            resp.team = new_team
+            resp.updated_at_us = now
+            self._responses.move_to_end(resp.user_id)
+            if self._composer is not None:
+                self._composer.place(resp.user_id, _player_info(resp))
 
 
 class SessionService:
     """Service for managing sessions and responses."""
     
-    # Session cache
+    # Session cache: chat_id -> Session, validated against sessions.version
     _cache: dict[int, Session] = {}
-    _cache_time: dict[int, float] = {}
-    _CACHE_TTL = 60  # seconds
+    _session_lock = asyncio.Lock()
+    
+    # Rosters of open sessions: session_id -> _Roster (loaded inside the session actor)
+    _rosters: dict[int, _Roster] = {}
     
     @classmethod
     async def get_or_create_session(cls, chat_id: int, force_refresh: bool = False) -> Session:
@@ -40,34 +102,58 @@ class SessionService:
         now = get_now(TIMEZONE)
         target_date = next_wednesday(now)
         
-        # Check cache
-        if not force_refresh and chat_id in cls._cache:
-            cached = cls._cache[chat_id]
-            cache_time = cls._cache_time.get(chat_id, 0)
-            if (time.time() - cache_time < cls._CACHE_TTL and 
-                cached.target_date == target_date and
-                not cached.is_closed):
+        if not force_refresh:
+            cached = await cls._get_cached(chat_id, target_date)
+            if cached:
                 return cached
         
+        # One loader at a time: concurrent first clicks must not create duplicate sessions
+        async with cls._session_lock:
+            if not force_refresh:
+                cached = await cls._get_cached(chat_id, target_date)
+                if cached:
+                    return cached
+            return await cls._load_or_create_session(chat_id, target_date)
+    
+    @classmethod
+    async def _get_cached(cls, chat_id: int, target_date: date) -> Optional[Session]:
+        """Cached open session for the target date if its version is still current.
+        
+        The check is a primary-key read of sessions.version, so writes made by
+        another process sharing the database file are noticed as well.
+        """
+        cached = cls._cache.get(chat_id)
+        if not cached or cached.target_date != target_date or cached.is_closed:
+            return None
+        if await get_storage().get_session_version(cached.id) != cached.version:
+            cls.invalidate_cache(chat_id)
+            return None
+        return cached
+    
+    @classmethod
+    async def _load_or_create_session(cls, chat_id: int, target_date: date) -> Session:
+        """Load the open session from storage, closing stale ones, or create it."""
         # Get from DB
-        open_session = await get_open_session(chat_id)
+        open_session = await get_storage().get_open_session(chat_id)
         if open_session and open_session["is_closed"] == 0:
             if open_session["target_date"] == target_date.isoformat():
-                session = Session.from_row(open_session)
+                session = await cls._session_from_row(open_session)
                 cls._update_cache(chat_id, session)
                 return session
-            await close_session(open_session["id"])
+            await get_storage().close_session(open_session["id"])
+            cls._rosters.pop(open_session["id"], None)
+            SessionActor.stop(open_session["id"])
             cls.invalidate_cache(chat_id)
         
         # Check for existing session with same date
-        existing = await get_session_by_date(chat_id, target_date)
+        existing = await get_storage().get_session_by_date(chat_id, target_date)
         if existing and existing["is_closed"] == 0:
-            session = Session.from_row(existing)
+            session = await cls._session_from_row(existing)
             cls._update_cache(chat_id, session)
             return session
         
         # Create new session
-        session_id = await create_session(chat_id, target_date)
+        session_id = await get_storage().create_session(chat_id, target_date)
         session = Session(
             id=session_id,
             chat_id=chat_id,
@@ -77,40 +163,87 @@ class SessionService:
         cls._update_cache(chat_id, session)
         return session
     
+    @classmethod
+    async def _session_from_row(cls, row) -> Session:
+        """Build a session with its list pages, which live in a separate table."""
+        session = Session.from_row(row)
+        session.list_pages = [
+            ListPage(message_id, text_hash)
+            for message_id, text_hash in await get_storage().fetch_list_pages(session.id)
+        ]
+        return session
+    
     @classmethod
     def _update_cache(cls, chat_id: int, session: Session) -> None:
         """Update session cache."""
         cls._cache[chat_id] = session
-        cls._cache_time[chat_id] = time.time()
+    
+    @classmethod
+    def get_cached_session(cls, session_id: int) -> Optional[Session]:
+        """Cached session by id (with current list/pinned message ids), without storage access."""
+        for cached in cls._cache.values():
+            if cached.id == session_id:
+                return cached
+        return None
     
     @classmethod
     def invalidate_cache(cls, chat_id: int) -> None:
         """Invalidate session cache."""
         cls._cache.pop(chat_id, None)
-        cls._cache_time.pop(chat_id, None)
+    
+    @classmethod
+    def _apply_session_write(cls, session_id: int, version: Optional[int], **fields) -> None:
+        """Apply our own session write to the cached copy.
+        
+        If the version skipped (another writer got in between), the cached
+        copy is dropped instead and reloaded on the next access.
+        """
+        for chat_id, cached in list(cls._cache.items()):
+            if cached.id != session_id:
+                continue
+            if version is not None and version == cached.version + 1:
+                for name, value in fields.items():
+                    setattr(cached, name, value)
+                cached.version = version
+            else:
+                cls.invalidate_cache(chat_id)
     
     @classmethod
     async def close_session(cls, session_id: int) -> None:
-        """Close a session."""
-        await close_session(session_id)
+        """Close a session and move closed-session responses out of the live table."""
+        version = await get_storage().close_session(session_id)
+        cls._apply_session_write(session_id, version, is_closed=True)
+        cls._rosters.pop(session_id, None)
+        SessionActor.stop(session_id)
+        await cls.archive_closed_sessions()
+    
+    @classmethod
+    async def archive_closed_sessions(cls) -> int:
+        """Archive responses of sessions closed longer than the retention period."""
+        archived_rows, _ = await get_storage().archive_closed_sessions(ARCHIVE_RETENTION_HOURS * 3600)
+        return archived_rows
     
     @classmethod
     async def get_open_session(cls, chat_id: int) -> Optional[Session]:
         """Get open session for chat."""
-        row = await get_open_session(chat_id)
+        row = await get_storage().get_open_session(chat_id)
         if row:
-            return Session.from_row(row)
+            return await cls._session_from_row(row)
         return None
     
     @classmethod
-    async def update_list_message_id(cls, session_id: int, message_id: Optional[int]) -> None:
-        """Update list message ID for session."""
-        await set_list_message_id(session_id, message_id)
+    async def update_list_pages(cls, session_id: int, pages: list[ListPage]) -> None:
+        """Store the list messages of the session (with the hashes of their texts) in page order."""
+        version = await get_storage().set_list_pages(
+            session_id, [(page.message_id, page.text_hash) for page in pages]
+        )
+        cls._apply_session_write(session_id, version, list_pages=list(pages))
     
     @classmethod
     async def update_pinned_message_id(cls, session_id: int, message_id: int) -> None:
         """Update pinned message ID for session."""
-        await set_pinned_message_id(session_id, message_id)
+        version = await get_storage().set_pinned_message_id(session_id, message_id)
+        cls._apply_session_write(session_id, version, pinned_message_id=message_id)
     
     @classmethod
     async def add_response(
@@ -123,24 +256,75 @@ class SessionService:
         team: str | None = None,
         is_goalie: bool = False
     ) -> None:
-        """Add or update player response."""
-        await upsert_response(session_id, chat_id, user_id, last_name, status.value, team, is_goalie)
+        """Add or update player response (serialized by the session actor)."""
+        async def command() -> None:
+            await get_storage().upsert_response(session_id, chat_id, user_id, last_name, status.value, team, is_goalie)
+            roster = cls._rosters.get(session_id)
+            if roster is not None:
+                roster.upsert(Response(
+                    session_id=session_id,
+                    chat_id=chat_id,
+                    user_id=user_id,
+                    last_name=last_name,
+                    status=status,
+                    team=team,
+                    is_goalie=is_goalie,
+                ))
+        
+        await SessionActor.submit(session_id, command)
     
     @classmethod
     async def delete_response(cls, session_id: int, last_name: str) -> bool:
-        """Delete response by last name."""
-        return await delete_response_by_last_name(session_id, last_name)
+        """Delete response by last name (serialized by the session actor)."""
+        async def command() -> bool:
+            deleted = await get_storage().delete_response_by_last_name(session_id, last_name)
+            roster = cls._rosters.get(session_id)
+            if deleted and roster is not None:
+                roster.delete_by_name(last_name)
+            return deleted
+        
+        return await SessionActor.submit(session_id, command)
     
     @classmethod
     async def update_team(cls, session_id: int, last_name: str, new_team: str) -> bool:
-        """Update team for a response by last name."""
-        return await update_response_team_by_last_name(session_id, last_name, new_team)
+        """Update team for a response by last name (serialized by the session actor)."""
+        async def command() -> bool:
+            updated = await get_storage().update_response_team_by_last_name(session_id, last_name, new_team)
+            roster = cls._rosters.get(session_id)
+            if updated and roster is not None:
+                roster.set_team_by_name(last_name, new_team)
+            return updated
+        
+        return await SessionActor.submit(session_id, command)
     
     @classmethod
     async def get_responses(cls, session_id: int) -> list[Response]:
-        """Get all responses for session."""
-        rows = await fetch_responses(session_id)
-        return [Response.from_row(row) for row in rows]
+        """Get all responses for session (from the in-memory roster once loaded)."""
+        roster = cls._rosters.get(session_id)
+        if roster is not None:
+            return roster.responses()
+        
+        return await SessionActor.submit(session_id, lambda: cls._load_roster(session_id))
+    
+    @classmethod
+    async def _load_roster(cls, session_id: int) -> list[Response]:
+        """Load responses from storage; runs inside the session actor.
+        
+        The actor orders the load after every response write already submitted,
+        and the write-behind buffer is flushed first, so the loaded roster is
+        complete and no write can slip in between the read and caching it.
+        """
+        roster = cls._rosters.get(session_id)
+        if roster is not None:
+            return roster.responses()
+        
+        storage = get_storage()
+        await storage.flush_responses()
+        responses = Response.from_rows(await storage.fetch_responses(session_id))
+        # Keep the roster only for a cached open session
+        if any(s.id == session_id and not s.is_closed for s in cls._cache.values()):
+            cls._rosters[session_id] = _Roster(responses)
+        return list(responses)
     
     @classmethod
     async def get_session_summary(cls, session: Session) -> SessionSummary:
@@ -149,12 +333,7 @@ class SessionService:
         
         summary = SessionSummary(session=session)
         for resp in responses:
-            player = PlayerInfo(
-                last_name=resp.last_name,
-                team=resp.team,
-                status=resp.status.value,
-                is_goalie=resp.is_goalie
-            )
+            player = _player_info(resp)
             if resp.status == ResponseStatus.YES:
                 summary.yes.append(player)
             elif resp.status == ResponseStatus.MAYBE:
@@ -164,25 +343,51 @@ class SessionService:
         
         return summary
     
+    @classmethod
+    async def _format_summary_blocks(cls, session: Session) -> list[str]:
+        """Summary text blocks.
+        
+        With a loaded roster only the blocks changed since the last render are
+        re-rendered; otherwise they are built in one pass over the responses.
+        """
+        roster = cls._rosters.get(session.id)
+        if roster is None:
+            responses = await cls.get_responses(session.id)
+            roster = cls._rosters.get(session.id)
+            if roster is None:
+                return render_summary_blocks(session.target_date, map(_player_info, responses))
+        return roster.summary_blocks(session.target_date)
+    
     @classmethod
     async def format_summary_text(cls, session: Session) -> str:
         """Format session summary as text."""
-        summary = await cls.get_session_summary(session)
-        return format_summary_message(
-            target_date=session.target_date,
-            yes=summary.yes,
-            maybe=summary.maybe,
-            no=summary.no
-        )
+        return "\n\n".join(await cls._format_summary_blocks(session))
+    
+    @classmethod
+    async def format_summary_pages(cls, session: Session) -> list[str]:
+        """Summary laid out across list messages of at most LIST_PAGE_MAX_CHARS, split between blocks."""
+        return split_summary_pages(await cls._format_summary_blocks(session), LIST_PAGE_MAX_CHARS)
     
     @classmethod
     async def get_player_counts(cls, session_id: int) -> dict[str, int]:
-        """Get player counts by status."""
-        responses = await cls.get_responses(session_id)
+        """Get player counts by status (from trigger-maintained counters)."""
         counts = {"YES": 0, "MAYBE": 0, "NO": 0}
-        for resp in responses:
-            if resp.status.value in counts:
-                counts[resp.status.value] += 1
+        for (status, _team, _is_goalie), count in (await get_storage().fetch_session_counts(session_id)).items():
+            if status in counts:
+                counts[status] += count
+        return counts
+    
+    @classmethod
+    async def get_team_counts(cls, session_id: int) -> dict[str, int]:
+        """Get YES counts per team: field players by team name, goalies under "goalies"."""
+        counts: dict[str, int] = {"goalies": 0}
+        for (status, team, is_goalie), count in (await get_storage().fetch_session_counts(session_id)).items():
+            if status != ResponseStatus.YES.value:
+                continue
+            if is_goalie:
+                counts["goalies"] += count
+            elif team:
+                counts[team] = counts.get(team, 0) + count
         return counts
 
 
@@ -192,19 +397,20 @@ class UserService:
     @classmethod
     async def get_last_name(cls, user_id: int) -> Optional[str]:
         """Get user's last name."""
-        return await get_user_last_name(user_id)
+        info = await get_storage().get_user_info(user_id)
+        return info.last_name if info else None
     
     @classmethod
-    async def get_info(cls, user_id: int) -> Optional[dict]:
+    async def get_info(cls, user_id: int) -> Optional[User]:
         """Get user's info (last_name and team)."""
-        return await get_user_info(user_id)
+        return await get_storage().get_user_info(user_id)
     
     @classmethod
     async def save_last_name(cls, user_id: int, last_name: str) -> None:
         """Save user's last name."""
-        await upsert_user_last_name(user_id, last_name)
+        await get_storage().upsert_user_last_name(user_id, last_name)
     
     @classmethod
     async def save_user_info(cls, user_id: int, last_name: str, team: str, is_goalie: bool = False) -> None:
         """Save user's info (last_name, team, is_goalie)."""
-        await upsert_user_info(user_id, last_name, team, is_goalie)
+        await get_storage().upsert_user_info(user_id, last_name, team, is_goalie)
@@ -0,0 +1,97 @@
+"""Incremental, block-level composition of the session summary text."""
+from __future__ import annotations
+
+from collections import OrderedDict
+from datetime import date
+from typing import Hashable, Iterable
+
+from metrics import SUMMARY_BLOCKS_RENDERED_TOTAL
+from models import PlayerInfo
+from utils import (
+    TEAM_EMOJI,
+    TITLE_MAYBE,
+    TITLE_NO,
+    TITLE_YES,
+    format_goalies_block,
+    format_status_block,
+    format_summary_header,
+    format_team_block,
+    summary_block_of,
+)
+
+
+# Блоки в порядке следования в тексте списка
+_BLOCKS = ("header", "yes", "maybe", "no", "teams", "goalies")
+_PLAYER_BLOCKS = ("yes", "maybe", "no", "goalies")
+_STATUS_TITLES = {"yes": TITLE_YES, "maybe": TITLE_MAYBE, "no": TITLE_NO}
+
+
+class SummaryComposer:
+    """Summary text assembled from individually cached blocks.
+
+    Players are kept per block as PlayerInfo records (the same split as
+    SessionSummary), together with YES counts per team. Every mutation bumps
+    the versions of the blocks it touched: the player's old and new block and,
+    for field players with YES, the team summary. render() re-renders only the
+    blocks whose cached version is behind; the header is cached per target_date.
+    """
+
+    def __init__(self, players: Iterable[tuple[int, PlayerInfo]] = ()) -> None:
+        self._players: dict[str, OrderedDict[int, PlayerInfo]] = {
+            block: OrderedDict() for block in _PLAYER_BLOCKS
+        }
+        self._block_of: dict[int, str] = {}
+        self._team_counts = dict.fromkeys(TEAM_EMOJI, 0)
+        self._versions = dict.fromkeys(_BLOCKS, 0)
+        # block -> (version the text was rendered at, text)
+        self._rendered: dict[str, tuple[Hashable, str]] = {}
+        for user_id, player in players:
+            self.place(user_id, player)
+
+    def place(self, user_id: int, player: PlayerInfo) -> None:
+        """Add or update a player; an updated player moves to the end of its block."""
+        self.remove(user_id)
+        block = summary_block_of(player)
+        if block is None:
+            return
+        self._players[block][user_id] = player
+        self._block_of[user_id] = block
+        self._touch(block, player, 1)
+
+    def remove(self, user_id: int) -> None:
+        block = self._block_of.pop(user_id, None)
+        if block is None:
+            return
+        self._touch(block, self._players[block].pop(user_id), -1)
+
+    def _touch(self, block: str, player: PlayerInfo, delta: int) -> None:
+        self._versions[block] += 1
+        if block == "yes" and player.team in self._team_counts:
+            self._team_counts[player.team] += delta
+            self._versions["teams"] += 1
+
+    def render(self, target_date: date) -> str:
+        """Full summary text."""
+        return "\n\n".join(self.render_blocks(target_date))
+
+    def render_blocks(self, target_date: date) -> list[str]:
+        """Summary blocks in text order; only blocks changed since the last call are re-rendered."""
+        parts = []
+        for block in _BLOCKS:
+            version = target_date if block == "header" else self._versions[block]
+            cached = self._rendered.get(block)
+            if cached is None or cached[0] != version:
+                cached = (version, self._render_block(block, target_date))
+                self._rendered[block] = cached
+                SUMMARY_BLOCKS_RENDERED_TOTAL.labels(block=block).inc()
+            parts.append(cached[1])
+        return parts
+
+    def _render_block(self, block: str, target_date: date) -> str:
+        if block == "header":
+            return format_summary_header(target_date)
+        if block == "teams":
+            return format_team_block(self._team_counts)
+        if block == "goalies":
+            return format_goalies_block(self._players[block].values())
+        return format_status_block(_STATUS_TITLES[block], self._players[block].values())
@@ -0,0 +1,438 @@
+"""Storage backends for sessions, responses and users.
+
+Сервисы работают с хранилищем через интерфейс Storage. Реализация выбирается
+настройкой STORAGE_ENGINE:
+    sqlite — текущая база (db.py), путь задаётся DB_PATH (в том числе ":memory:");
+    memory — чистые словари в памяти процесса с той же семантикой, для нагрузочных
+             тестов и бенчмарков обработчиков без затрат на SQLite.
+"""
+from __future__ import annotations
+
+import time
+from abc import ABC, abstractmethod
+from datetime import date
+from typing import Any, Mapping, Optional
+
+import backup
+import db
+from config import STORAGE_ENGINE
+from models import User
+from utils import normalize_last_name, utc_now_us
+
+
+Row = Mapping[str, Any]
+
+
+class Storage(ABC):
+    """Persistence interface used by the services layer."""
+
+    @abstractmethod
+    async def init(self) -> None:
+        """Prepare the storage (schema, connections)."""
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Flush pending writes and release resources."""
+
+    # --- users ---
+
+    @abstractmethod
+    async def get_user_info(self, user_id: int) -> Optional[User]:
+        """Get user's last name, team and goalie flag."""
+
+    @abstractmethod
+    async def upsert_user_info(self, user_id: int, last_name: str, team: str, is_goalie: bool = False) -> None:
+        """Save user's last name, team and goalie flag."""
+
+    @abstractmethod
+    async def upsert_user_last_name(self, user_id: int, last_name: str) -> None:
+        """Save user's last name keeping the other fields."""
+
+    # --- sessions ---
+
+    @abstractmethod
+    async def get_open_session(self, chat_id: int) -> Optional[Row]:
+        """Latest open session of the chat."""
+
+    @abstractmethod
+    async def get_session_by_date(self, chat_id: int, target_date: date) -> Optional[Row]:
+        """Latest session of the chat for the date."""
+
+    @abstractmethod
+    async def get_session_version(self, session_id: int) -> Optional[int]:
+        """Current version of the session row (bumped by every session write)."""
+
+    @abstractmethod
+    async def create_session(self, chat_id: int, target_date: date) -> int:
+        """Create an open session (version 1) and return its id."""
+
+    @abstractmethod
+    async def close_session(self, session_id: int) -> Optional[int]:
+        """Mark session as closed; returns the new version."""
+
+    @abstractmethod
+    async def fetch_list_pages(self, session_id: int) -> list[tuple[int, Optional[str]]]:
+        """List messages of the session in page order: (message_id, text_hash)."""
+
+    @abstractmethod
+    async def set_list_pages(self, session_id: int, pages: list[tuple[int, Optional[str]]]) -> Optional[int]:
+        """Replace the list messages of the session; returns the new version."""
+
+    @abstractmethod
+    async def set_pinned_message_id(self, session_id: int, message_id: int) -> Optional[int]:
+        """Store the pinned message id of the session; returns the new version."""
+
+    # --- responses ---
+
+    @abstractmethod
+    async def upsert_response(
+        self,
+        session_id: int,
+        chat_id: int,
+        user_id: int,
+        last_name: str,
+        status: str,
+        team: Optional[str] = None,
+        is_goalie: bool = False,
+    ) -> None:
+        """Add or replace the user's response in the session."""
+
+    @abstractmethod
+    async def fetch_responses(self, session_id: int) -> list[Row]:
+        """Responses of the session ordered by updated_at."""
+
+    @abstractmethod
+    async def flush_responses(self) -> None:
+        """Write buffered responses through to the store."""
+
+    @abstractmethod
+    async def fetch_session_counts(self, session_id: int) -> dict[tuple[str, str, bool], int]:
+        """Response counts keyed by (status, team or "", is_goalie)."""
+
+    @abstractmethod
+    async def delete_response_by_last_name(self, session_id: int, last_name: str) -> bool:
+        """Delete participant by last name; True if found."""
+
+    @abstractmethod
+    async def update_response_team_by_last_name(self, session_id: int, last_name: str, new_team: str) -> bool:
+        """Change participant's team by last name; True if found."""
+
+    # --- delayed message deletions ---
+
+    @abstractmethod
+    async def fetch_pending_deletions(self) -> list[tuple[int, int, int]]:
+        """All pending deletions as (chat_id, message_id, due_at_us)."""
+
+    @abstractmethod
+    async def save_pending_deletions(
+        self,
+        added: list[tuple[int, int, int]],
+        removed: list[tuple[int, int]],
+    ) -> None:
+        """Persist new (chat_id, message_id, due_at_us) entries and drop finished ones."""
+
+    # --- housekeeping ---
+
+    @abstractmethod
+    async def archive_closed_sessions(self, retention_seconds: int = 0) -> tuple[int, int]:
+        """Move responses of closed sessions out of the live set; returns (rows, freed pages)."""
+
+    @abstractmethod
+    async def run_maintenance(self) -> None:
+        """Periodic housekeeping (checkpoint, statistics, vacuum)."""
+
+    @abstractmethod
+    async def create_backup(self) -> Optional[str]:
+        """Take an online snapshot of the data; returns its path or None if not supported."""
+
+
+class SqliteStorage(Storage):
+    """SQLite backend: thin adapter over the functions in db.py."""
+
+    async def init(self) -> None:
+        await db.init_db()
+
+    async def close(self) -> None:
+        await db.close_db()
+
+    async def get_user_info(self, user_id: int) -> Optional[User]:
+        return await db.get_user_info(user_id)
+
+    async def upsert_user_info(self, user_id: int, last_name: str, team: str, is_goalie: bool = False) -> None:
+        await db.upsert_user_info(user_id, last_name, team, is_goalie)
+
+    async def upsert_user_last_name(self, user_id: int, last_name: str) -> None:
+        await db.upsert_user_last_name(user_id, last_name)
+
+    async def get_open_session(self, chat_id: int) -> Optional[Row]:
+        return await db.get_open_session(chat_id)
+
+    async def get_session_by_date(self, chat_id: int, target_date: date) -> Optional[Row]:
+        return await db.get_session_by_date(chat_id, target_date)
+
+    async def get_session_version(self, session_id: int) -> Optional[int]:
+        return await db.get_session_version(session_id)
+
+    async def create_session(self, chat_id: int, target_date: date) -> int:
+        return await db.create_session(chat_id, target_date)
+
+    async def close_session(self, session_id: int) -> Optional[int]:
+        return await db.close_session(session_id)
+
+    async def fetch_list_pages(self, session_id: int) -> list[tuple[int, Optional[str]]]:
+        return await db.fetch_list_pages(session_id)
+
+    async def set_list_pages(self, session_id: int, pages: list[tuple[int, Optional[str]]]) -> Optional[int]:
+        return await db.set_list_pages(session_id, pages)
+
+    async def set_pinned_message_id(self, session_id: int, message_id: int) -> Optional[int]:
+        return await db.set_pinned_message_id(session_id, message_id)
+
+    async def upsert_response(
+        self,
+        session_id: int,
+        chat_id: int,
+        user_id: int,
+        last_name: str,
+        status: str,
+        team: Optional[str] = None,
+        is_goalie: bool = False,
+    ) -> None:
+        await db.upsert_response(session_id, chat_id, user_id, last_name, status, team, is_goalie)
+
+    async def fetch_responses(self, session_id: int) -> list[Row]:
+        return await db.fetch_responses(session_id)
+
+    async def flush_responses(self) -> None:
+        await db.flush_responses()
+
+    async def fetch_session_counts(self, session_id: int) -> dict[tuple[str, str, bool], int]:
+        return await db.fetch_session_counts(session_id)
+
+    async def delete_response_by_last_name(self, session_id: int, last_name: str) -> bool:
+        return await db.delete_response_by_last_name(session_id, last_name)
+
+    async def update_response_team_by_last_name(self, session_id: int, last_name: str, new_team: str) -> bool:
+        return await db.update_response_team_by_last_name(session_id, last_name, new_team)
+
+    async def fetch_pending_deletions(self) -> list[tuple[int, int, int]]:
+        return await db.fetch_pending_deletions()
+
+    async def save_pending_deletions(
+        self,
+        added: list[tuple[int, int, int]],
+        removed: list[tuple[int, int]],
+    ) -> None:
+        await db.save_pending_deletions(added, removed)
+
+    async def archive_closed_sessions(self, retention_seconds: int = 0) -> tuple[int, int]:
+        return await db.archive_closed_sessions(retention_seconds)
+
+    async def run_maintenance(self) -> None:
+        await db.run_maintenance()
+
+    async def create_backup(self) -> Optional[str]:
+        return await backup.create_backup()
+
+
+class MemoryStorage(Storage):
+    """In-process backend with the same semantics as SQLite; data lives until restart."""
+
+    def __init__(self) -> None:
+        self._users: dict[int, User] = {}
+        self._sessions: dict[int, dict[str, Any]] = {}
+        self._next_session_id = 1
+        # session_id -> user_id -> строка ответа
+        self._responses: dict[int, dict[int, dict[str, Any]]] = {}
+        self._archive: list[tuple] = []
+        # (chat_id, message_id) -> due_at_us
+        self._pending_deletions: dict[tuple[int, int], int] = {}
+        # session_id -> [(message_id, text_hash)] по порядку страниц
+        self._list_pages: dict[int, list[tuple[int, Optional[str]]]] = {}
+
+    async def init(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def get_user_info(self, user_id: int) -> Optional[User]:
+        return self._users.get(user_id)
+
+    async def upsert_user_info(self, user_id: int, last_name: str, team: str, is_goalie: bool = False) -> None:
+        self._users[user_id] = User(user_id=user_id, last_name=last_name, team=team, is_goalie=is_goalie)
+
+    async def upsert_user_last_name(self, user_id: int, last_name: str) -> None:
+        current = self._users.get(user_id)
+        self._users[user_id] = User(
+            user_id=user_id,
+            last_name=last_name,
+            team=current.team if current else None,
+            is_goalie=current.is_goalie if current else False,
+        )
+
+    def _latest_session(self, predicate) -> Optional[Row]:
+        matches = [s for s in self._sessions.values() if predicate(s)]
+        if not matches:
+            return None
+        return dict(max(matches, key=lambda s: s["id"]))
+
+    async def get_open_session(self, chat_id: int) -> Optional[Row]:
+        return self._latest_session(lambda s: s["chat_id"] == chat_id and not s["is_closed"])
+
+    async def get_session_by_date(self, chat_id: int, target_date: date) -> Optional[Row]:
+        target = target_date.isoformat()
+        return self._latest_session(lambda s: s["chat_id"] == chat_id and s["target_date"] == target)
+
+    async def create_session(self, chat_id: int, target_date: date) -> int:
+        session_id = self._next_session_id
+        self._next_session_id += 1
+        self._sessions[session_id] = {
+            "id": session_id,
+            "chat_id": chat_id,
+            "target_date": target_date.isoformat(),
+            "is_closed": 0,
+            "pinned_message_id": None,
+            "closed_at": None,
+            "version": 1,
+        }
+        return session_id
+
+    async def get_session_version(self, session_id: int) -> Optional[int]:
+        session = self._sessions.get(session_id)
+        return session["version"] if session else None
+
+    def _update_session(self, session_id: int, **fields: Any) -> Optional[int]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        session.update(fields)
+        session["version"] += 1
+        return session["version"]
+
+    async def close_session(self, session_id: int) -> Optional[int]:
+        return self._update_session(session_id, is_closed=1, closed_at=int(time.time()))
+
+    async def fetch_list_pages(self, session_id: int) -> list[tuple[int, Optional[str]]]:
+        return list(self._list_pages.get(session_id, []))
+
+    async def set_list_pages(self, session_id: int, pages: list[tuple[int, Optional[str]]]) -> Optional[int]:
+        self._list_pages[session_id] = list(pages)
+        return self._update_session(session_id)
+
+    async def set_pinned_message_id(self, session_id: int, message_id: int) -> Optional[int]:
+        return self._update_session(session_id, pinned_message_id=message_id)
+
+    async def upsert_response(
+        self,
+        session_id: int,
+        chat_id: int,
+        user_id: int,
+        last_name: str,
+        status: str,
+        team: Optional[str] = None,
+        is_goalie: bool = False,
+    ) -> None:
+        self._responses.setdefault(session_id, {})[user_id] = {
+            "session_id": session_id,
+            "chat_id": chat_id,
+            "user_id": user_id,
+            "last_name": last_name,
+            "name_key": normalize_last_name(last_name),
+            "status": status,
+            "team": team,
+            "is_goalie": int(is_goalie),
+            "updated_at": utc_now_us(),
+        }
+
+    async def fetch_responses(self, session_id: int) -> list[Row]:
+        # Тот же порядок, что даёт индекс (session_id, updated_at, user_id) в SQLite
+        rows = self._responses.get(session_id, {}).values()
+        return [dict(row) for row in sorted(rows, key=lambda r: (r["updated_at"], r["user_id"]))]
+
+    async def flush_responses(self) -> None:
+        pass
+
+    async def fetch_session_counts(self, session_id: int) -> dict[tuple[str, str, bool], int]:
+        counts: dict[tuple[str, str, bool], int] = {}
+        for row in self._responses.get(session_id, {}).values():
+            key = (row["status"], row["team"] or "", bool(row["is_goalie"]))
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def _find_by_name(self, session_id: int, last_name: str) -> list[dict[str, Any]]:
+        name_key = normalize_last_name(last_name)
+        return [row for row in self._responses.get(session_id, {}).values() if row["name_key"] == name_key]
+
+    async def delete_response_by_last_name(self, session_id: int, last_name: str) -> bool:
+        rows = self._find_by_name(session_id, last_name)
+        for row in rows:
+            del self._responses[session_id][row["user_id"]]
+        return bool(rows)
+
+    async def update_response_team_by_last_name(self, session_id: int, last_name: str, new_team: str) -> bool:
+        rows = self._find_by_name(session_id, last_name)
+        for row in rows:
+            row["team"] = new_team
+            row["updated_at"] = utc_now_us()
+        return bool(rows)
+
+    async def fetch_pending_deletions(self) -> list[tuple[int, int, int]]:
+        return [(chat_id, message_id, due) for (chat_id, message_id), due in self._pending_deletions.items()]
+
+    async def save_pending_deletions(
+        self,
+        added: list[tuple[int, int, int]],
+        removed: list[tuple[int, int]],
+    ) -> None:
+        for chat_id, message_id, due in added:
+            self._pending_deletions[(chat_id, message_id)] = due
+        for key in removed:
+            self._pending_deletions.pop(key, None)
+
+    async def archive_closed_sessions(self, retention_seconds: int = 0) -> tuple[int, int]:
+        cutoff = int(time.time()) - retention_seconds
+        archived_rows = 0
+        for session_id, session in self._sessions.items():
+            if not session["is_closed"] or (session["closed_at"] or 0) > cutoff:
+                continue
+            self._list_pages.pop(session_id, None)
+            for row in self._responses.pop(session_id, {}).values():
+                self._archive.append((
+                    session_id,
+                    row["user_id"],
+                    row["last_name"],
+                    db.ARCHIVE_STATUS_CODES[row["status"]],
+                    row["team"],
+                    row["is_goalie"],
+                    row["updated_at"] // 1_000_000,
+                ))
+                archived_rows += 1
+        return archived_rows, 0
+
+    async def run_maintenance(self) -> None:
+        pass
+
+    async def create_backup(self) -> Optional[str]:
+        # Данные живут только в памяти процесса — снимать нечего
+        return None
+
+
+_STORAGE_ENGINES = {
+    "sqlite": SqliteStorage,
+    "memory": MemoryStorage,
+}
+_storage: Optional[Storage] = None
+
+
+def get_storage() -> Storage:
+    """Storage backend selected by STORAGE_ENGINE (created on first use)."""
+    global _storage
+    if _storage is None:
+        try:
+            _storage = _STORAGE_ENGINES[STORAGE_ENGINE]()
+        except KeyError:
+            raise RuntimeError(
+                f"Unknown STORAGE_ENGINE: {STORAGE_ENGINE} (expected one of {', '.join(_STORAGE_ENGINES)})"
+            ) from None
+    return _storage
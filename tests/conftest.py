@@ -0,0 +1,108 @@
+"""Test environment: config is read from env vars at import time."""
+import asyncio
+import os
+import sys
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+# Обязательные переменные и хранилище в памяти — до первого импорта config
+os.environ.setdefault("BOT_TOKEN", "123456:TEST")
+os.environ.setdefault("CHAT_ID", "-1001")
+os.environ["STORAGE_ENGINE"] = "memory"
+# Правки списка применяются сразу, без окна объединения
+os.environ["SUMMARY_EDIT_INTERVAL_MS"] = "0"
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from aiogram.exceptions import TelegramBadRequest  # noqa: E402
+
+import storage as storage_module  # noqa: E402
+from services.message_service import MessageService  # noqa: E402
+from services.session_actor import SessionActor  # noqa: E402
+from services.session_service import SessionService  # noqa: E402
+from storage import MemoryStorage, Storage  # noqa: E402
+
+
+class CountingStorage(MemoryStorage):
+    """MemoryStorage counting calls of every Storage method."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: Counter[str] = Counter()
+
+
+def _counted(name):
+    async def method(self, *args, **kwargs):
+        self.calls[name] += 1
+        return await getattr(MemoryStorage, name)(self, *args, **kwargs)
+    method.__name__ = name
+    return method
+
+
+for _name in Storage.__abstractmethods__:
+    setattr(CountingStorage, _name, _counted(_name))
+
+
+class FakeBot:
+    """Bot keeping the chat's messages in memory and counting Telegram calls."""
+
+    def __init__(self) -> None:
+        self.calls: Counter[str] = Counter()
+        self.messages: dict[int, str] = {}
+        # Задержка ответа на правку: пока она идёт, выполняются другие команды
+        self.edit_delay = 0.0
+        self.edit_errors: list[Exception] = []
+        self._next_id = 100
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls["send_message"] += 1
+        self._next_id += 1
+        self.messages[self._next_id] = text
+        return SimpleNamespace(message_id=self._next_id, chat=SimpleNamespace(id=chat_id))
+
+    async def edit_message_text(self, text, chat_id, message_id, **kwargs):
+        self.calls["edit_message_text"] += 1
+        if self.edit_errors:
+            raise self.edit_errors.pop(0)
+        if message_id not in self.messages:
+            raise TelegramBadRequest(method=None, message="Bad Request: message to edit not found")
+        self.messages[message_id] = text
+        # Правка уже применена, ответ приходит с задержкой
+        await asyncio.sleep(self.edit_delay)
+
+    async def delete_message(self, chat_id, message_id):
+        self.calls["delete_message"] += 1
+        self.messages.pop(message_id, None)
+
+    async def delete_messages(self, chat_id, message_ids):
+        self.calls["delete_messages"] += 1
+        for message_id in message_ids:
+            self.messages.pop(message_id, None)
+
+
+@pytest.fixture
+def storage(monkeypatch) -> CountingStorage:
+    """Fresh counting storage and service state for one test."""
+    counting = CountingStorage()
+    monkeypatch.setattr(storage_module, "_storage", counting)
+    monkeypatch.setattr(SessionService, "_cache", {})
+    monkeypatch.setattr(SessionService, "_rosters", {})
+    monkeypatch.setattr(SessionActor, "_actors", {})
+    monkeypatch.setattr(SessionActor, "_stopped", {})
+    monkeypatch.setattr(MessageService, "_last_start_messages", {})
+    monkeypatch.setattr(MessageService, "_summary_pending", {})
+    monkeypatch.setattr(MessageService, "_summary_editors", {})
+    monkeypatch.setattr(MessageService, "_summary_last_edit", {})
+    monkeypatch.setattr(MessageService, "_summary_not_before", {})
+    monkeypatch.setattr(MessageService, "_summary_failures", {})
+    monkeypatch.setattr(MessageService, "_summary_flush", asyncio.Event())
+    # Отложенные удаления не относятся к проверяемым сценариям
+    monkeypatch.setattr(MessageService, "schedule_delete", classmethod(lambda cls, *args, **kwargs: None))
+    return counting
+
+
+@pytest.fixture
+def bot() -> FakeBot:
+    return FakeBot()
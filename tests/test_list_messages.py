@@ -0,0 +1,122 @@
+"""List messages stay consistent with the session's pages."""
+import asyncio
+import time
+from types import SimpleNamespace
+
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter
+
+import services.message_service as message_service
+
+from config import CHAT_ID
+from handlers.commands import cmd_status
+from models import ResponseStatus
+from services.message_service import MessageService
+from services.session_actor import SessionActor
+from services.session_service import SessionService
+
+
+def _message(bot) -> SimpleNamespace:
+    async def answer(text, **kwargs):
+        return await bot.send_message(CHAT_ID, text)
+    return SimpleNamespace(chat=SimpleNamespace(id=CHAT_ID), message_id=1, answer=answer)
+
+
+def _run(scenario) -> None:
+    async def main():
+        try:
+            await scenario()
+        finally:
+            await MessageService.flush_summaries()
+            await SessionActor.stop_all()
+    asyncio.run(main())
+
+
+def _assert_list_shown(bot, session) -> None:
+    """The stored pages are exactly the list messages present in the chat."""
+    page_ids = SessionService.get_cached_session(session.id).list_message_ids
+    assert page_ids
+    assert all(message_id in bot.messages for message_id in page_ids)
+    assert not [
+        message_id for message_id, text in bot.messages.items()
+        if message_id not in page_ids and text.startswith("Среда")
+    ]
+
+
+def test_status_during_slow_summary_edit_keeps_a_list(storage, bot):
+    async def scenario():
+        session = await SessionService.get_or_create_session(CHAT_ID)
+        await MessageService.ensure_list_message(bot, session)
+
+        bot.edit_delay = 0.05
+        await SessionService.add_response(session.id, CHAT_ID, 1, "Иванов", ResponseStatus.YES, "Армада")
+        await MessageService.update_summary(bot, session)
+        await asyncio.sleep(0.01)
+        assert bot.calls["edit_message_text"] == 1  # Правка списка ещё идёт
+
+        await cmd_status(_message(bot), bot)
+        await MessageService.flush_summaries()
+
+        _assert_list_shown(bot, session)
+
+    _run(scenario)
+
+
+def test_flood_controlled_edit_is_retried_outside_the_actor(storage, bot):
+    async def scenario():
+        session = await SessionService.get_or_create_session(CHAT_ID)
+        await MessageService.ensure_list_message(bot, session)
+        list_id = session.list_message_ids[0]
+
+        bot.edit_errors.append(TelegramRetryAfter(method=None, message="Too Many Requests", retry_after=0.2))
+        await SessionService.add_response(session.id, CHAT_ID, 1, "Иванов", ResponseStatus.YES, "Армада")
+        await MessageService.update_summary(bot, session)
+        await asyncio.sleep(0.01)
+        assert bot.calls["edit_message_text"] == 1
+
+        # Актор не ждёт паузы flood control
+        start = time.monotonic()
+        await SessionService.add_response(session.id, CHAT_ID, 2, "Петров", ResponseStatus.YES, "Кабаны")
+        assert time.monotonic() - start < 0.1
+
+        await asyncio.sleep(0.3)
+        assert bot.calls["edit_message_text"] == 2
+        assert session.list_message_ids == [list_id]
+        assert "Петров" in bot.messages[list_id]
+
+    _run(scenario)
+
+
+def test_failed_edit_keeps_the_page_and_is_retried(storage, bot, monkeypatch):
+    monkeypatch.setattr(message_service, "_EDIT_RETRY_DELAY", 0.05)
+
+    async def scenario():
+        session = await SessionService.get_or_create_session(CHAT_ID)
+        await MessageService.ensure_list_message(bot, session)
+        list_id = session.list_message_ids[0]
+
+        bot.edit_errors.append(TelegramNetworkError(method=None, message="Request timeout error"))
+        await SessionService.add_response(session.id, CHAT_ID, 1, "Иванов", ResponseStatus.YES, "Армада")
+        await MessageService.update_summary(bot, session)
+        await asyncio.sleep(0.15)
+
+        assert bot.calls["edit_message_text"] == 2
+        assert bot.calls["delete_messages"] == 0 and bot.calls["send_message"] == 1
+        assert session.list_message_ids == [list_id]
+        assert "Иванов" in bot.messages[list_id]
+
+    _run(scenario)
+
+
+def test_deleted_page_is_sent_again(storage, bot):
+    async def scenario():
+        session = await SessionService.get_or_create_session(CHAT_ID)
+        await MessageService.ensure_list_message(bot, session)
+        del bot.messages[session.list_message_ids[0]]
+
+        await SessionService.add_response(session.id, CHAT_ID, 1, "Иванов", ResponseStatus.YES, "Армада")
+        await MessageService.ensure_list_message(bot, session)
+
+        _assert_list_shown(bot, session)
+        assert bot.calls["send_message"] == 2
+
+    _run(scenario)
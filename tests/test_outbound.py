@@ -0,0 +1,40 @@
+"""Flood-control handling of the outbound request middleware."""
+import asyncio
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import EditMessageText, SendMessage
+
+from outbound import OutboundThrottle
+
+
+def _flood_controlled(calls: list[str]):
+    async def make_request(bot, method):
+        calls.append(type(method).__name__)
+        if len(calls) == 1:
+            raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=0.05)
+        return True
+    return make_request
+
+
+def test_send_is_retried_after_retry_after():
+    async def scenario():
+        calls: list[str] = []
+        throttle = OutboundThrottle(global_per_sec=100, group_per_min=600)
+        assert await throttle(_flood_controlled(calls), None, SendMessage(chat_id=-1, text="x"))
+        assert calls == ["SendMessage", "SendMessage"]
+
+    asyncio.run(scenario())
+
+
+def test_edit_is_not_retried_in_place():
+    async def scenario():
+        calls: list[str] = []
+        throttle = OutboundThrottle(global_per_sec=100, group_per_min=600)
+        with pytest.raises(TelegramRetryAfter):
+            await throttle(_flood_controlled(calls), None, EditMessageText(chat_id=-1, message_id=1, text="x"))
+        assert calls == ["EditMessageText"]
+        # Пауза чата всё равно соблюдается следующими запросами
+        assert throttle._chat_bucket(-1).paused_until > 0
+
+    asyncio.run(scenario())
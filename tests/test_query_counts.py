@@ -0,0 +1,118 @@
+"""Storage calls made by the per-vote handlers.
+
+Each handler runs against MemoryStorage wrapped with call counters and a fake
+Bot; the session is already cached, so a vote may look it up at most once.
+"""
+import asyncio
+from collections import Counter
+from types import SimpleNamespace
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage as FSMMemoryStorage
+
+from config import CHAT_ID
+from handlers.commands import cmd_status
+from handlers.states import LastNameState, change_team_select_callback, guest_team_callback
+from models import ResponseStatus
+from services.message_service import MessageService
+from services.session_actor import SessionActor
+from services.session_service import SessionService
+
+
+SESSION_LOOKUPS = ("get_open_session", "get_session_by_date", "get_session_version", "create_session")
+
+
+def _session_lookups(storage) -> int:
+    return sum(storage.calls[name] for name in SESSION_LOOKUPS)
+
+
+def _message(bot, message_id: int = 1) -> SimpleNamespace:
+    async def answer(text, **kwargs):
+        return await bot.send_message(CHAT_ID, text)
+    return SimpleNamespace(chat=SimpleNamespace(id=CHAT_ID), message_id=message_id, answer=answer)
+
+
+def _callback(bot, data: str) -> SimpleNamespace:
+    async def answer(*args, **kwargs):
+        pass
+    return SimpleNamespace(data=data, message=_message(bot, message_id=2), answer=answer)
+
+
+def _state() -> FSMContext:
+    return FSMContext(storage=FSMMemoryStorage(), key=StorageKey(bot_id=1, chat_id=CHAT_ID, user_id=7))
+
+
+async def _open_session(bot):
+    """Open session with a list message and two players, as after earlier votes."""
+    session = await SessionService.get_or_create_session(CHAT_ID)
+    await SessionService.add_response(session.id, CHAT_ID, 1, "Иванов", ResponseStatus.YES, "Армада")
+    await SessionService.add_response(session.id, CHAT_ID, 2, "Петров", ResponseStatus.MAYBE, "Кабаны")
+    await MessageService.ensure_list_message(bot, session)
+    return session
+
+
+def _run(scenario) -> None:
+    async def main():
+        try:
+            await scenario()
+        finally:
+            await MessageService.flush_summaries()
+            await SessionActor.stop_all()
+    asyncio.run(main())
+
+
+def test_status_reuses_cached_session(storage, bot):
+    async def scenario():
+        await _open_session(bot)
+        storage.calls.clear()
+
+        await cmd_status(_message(bot), bot)
+
+        assert storage.calls == Counter({"get_session_version": 1, "set_list_pages": 2})
+
+    _run(scenario)
+
+
+def test_guest_team_looks_up_session_once(storage, bot):
+    async def scenario():
+        session = await _open_session(bot)
+        state = _state()
+        await state.set_state(LastNameState.waiting_guest_team)
+        await state.update_data(guest_last_name="Гость", session_id=session.id, added_by_user_id=1)
+        storage.calls.clear()
+
+        await guest_team_callback(_callback(bot, "team:Армада"), state, bot)
+        await MessageService.flush_summaries()
+
+        assert _session_lookups(storage) == 1
+        assert storage.calls == Counter({
+            "upsert_response": 1,
+            "get_session_version": 1,
+            "fetch_session_counts": 1,
+            "set_list_pages": 1,
+        })
+
+    _run(scenario)
+
+
+def test_change_team_select_looks_up_session_once(storage, bot):
+    async def scenario():
+        session = await _open_session(bot)
+        state = _state()
+        await state.set_state(LastNameState.waiting_change_team_select)
+        await state.update_data(change_last_name="Петров", session_id=session.id)
+        storage.calls.clear()
+
+        await change_team_select_callback(_callback(bot, "team:Армада"), state, bot)
+        await MessageService.flush_summaries()
+
+        assert _session_lookups(storage) == 1
+        assert storage.calls == Counter({
+            "update_response_team_by_last_name": 1,
+            "get_session_version": 1,
+            "fetch_session_counts": 1,
+            "set_list_pages": 1,
+        })
+
+    _run(scenario)
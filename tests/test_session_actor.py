@@ -0,0 +1,51 @@
+"""Commands submitted after a session's actor is stopped."""
+import asyncio
+
+import pytest
+
+from services.session_actor import SessionActor
+
+
+@pytest.fixture(autouse=True)
+def actors(monkeypatch):
+    monkeypatch.setattr(SessionActor, "_actors", {})
+    monkeypatch.setattr(SessionActor, "_stopped", {})
+
+
+def _command(order: list[str], tag: str, delay: float = 0):
+    async def command():
+        await asyncio.sleep(delay)
+        order.append(tag)
+        return tag
+    return command
+
+
+def test_submit_after_stop_runs_inline_after_queued_commands():
+    async def scenario():
+        order: list[str] = []
+        queued = [
+            asyncio.create_task(SessionActor.submit(1, _command(order, f"queued{idx}", 0.01)))
+            for idx in range(2)
+        ]
+        await asyncio.sleep(0)
+        SessionActor.stop(1)
+
+        assert await SessionActor.submit(1, _command(order, "late")) == "late"
+        assert order == ["queued0", "queued1", "late"]
+        assert 1 not in SessionActor._actors
+        await asyncio.gather(*queued)
+
+    asyncio.run(scenario())
+
+
+def test_submit_after_stop_all_creates_no_actor():
+    async def scenario():
+        order: list[str] = []
+        await SessionActor.submit(1, _command(order, "before"))
+        await SessionActor.stop_all()
+
+        await SessionActor.submit(1, _command(order, "after"))
+        assert order == ["before", "after"]
+        assert SessionActor._actors == {}
+
+    asyncio.run(scenario())
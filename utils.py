@@ -1,9 +1,15 @@
 from __future__ import annotations
 
+import hashlib
 from dataclasses import dataclass
 from datetime import date, datetime, time, timedelta
+from time import time_ns
+from typing import TYPE_CHECKING, Iterable, Mapping, Optional
 from zoneinfo import ZoneInfo
 
+if TYPE_CHECKING:
+    from models import PlayerInfo
+
 
 STATUS_YES = "YES"
 STATUS_MAYBE = "MAYBE"
@@ -17,6 +23,24 @@ class WeekSession:
     close_time: time
 
 
+_EPOCH = datetime(1970, 1, 1)
+
+
+def utc_now_us() -> int:
+    """Текущее время UTC в микросекундах от эпохи (формат updated_at в БД)."""
+    return time_ns() // 1000
+
+
+def to_epoch_us(value: datetime) -> int:
+    """Наивный UTC datetime → микросекунды от эпохи."""
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+def from_epoch_us(value: int) -> datetime:
+    """Микросекунды от эпохи → наивный UTC datetime."""
+    return _EPOCH + timedelta(microseconds=value)
+
+
 def get_now(tz_name: str) -> datetime:
     return datetime.now(tz=ZoneInfo(tz_name))
 
@@ -54,81 +78,163 @@ def format_team_with_emoji(team: str) -> str:
     return team
 
 
-def format_player_line(player) -> str:
-    """Форматирует строку для игрока: Фамилия (Команда 🏆) - Статус [- ВРАТАРЬ 🥅]."""
-    last_name = player.last_name if hasattr(player, 'last_name') else player.get("last_name", "")
-    team = player.team if hasattr(player, 'team') else player.get("team")
-    status = player.status if hasattr(player, 'status') else player.get("status", "")
-    is_goalie = player.is_goalie if hasattr(player, 'is_goalie') else player.get("is_goalie", False)
+def normalize_last_name(last_name: str) -> str:
+    """Ключ для поиска по фамилии: без регистра, Ё → Е, пробелы схлопнуты.
     
-    goalie_suffix = f" - ВРАТАРЬ {GOALIE_EMOJI}" if is_goalie else ""
-    
-    if team:
-        team_with_emoji = format_team_with_emoji(team)
-        return f"{last_name} ({team_with_emoji}) - {status}{goalie_suffix}"
-    return f"{last_name} - {status}{goalie_suffix}"
+    SQLite LOWER() не понимает кириллицу, поэтому ключ считается в Python и хранится в БД.
+    """
+    return " ".join(last_name.split()).casefold().replace("ё", "е")
 
 
-def format_status_list(title: str, items: list, exclude_goalies: bool = False) -> str:
-    """Форматирует список игроков с нумерацией.
-    
-    Args:
-        title: Заголовок списка
-        items: Список игроков
-        exclude_goalies: Если True, вратари не включаются в список
-    """
-    # Фильтруем вратарей если нужно
-    if exclude_goalies:
-        items = [p for p in items if not (p.is_goalie if hasattr(p, 'is_goalie') else p.get("is_goalie", False))]
-    
-    if not items:
-        return f"{title}\n—"
-    numbered = "\n".join(
-        f"{idx}. {format_player_line(player)}" 
-        for idx, player in enumerate(items, start=1)
+def text_digest(text: str) -> str:
+    """Короткий хэш текста сообщения — чтобы не отправлять правку без изменений."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+# Заголовки блоков списка
+TITLE_YES = "Я буду хоккеюги"
+TITLE_MAYBE = "Пока не определился"
+TITLE_NO = "Не смогу пойти, сорри"
+EMPTY_BLOCK = "—"
+
+# Подписи команд считаются один раз, а не на каждого игрока
+_TEAM_LABELS = {team: format_team_with_emoji(team) for team in TEAM_EMOJI}
+
+
+def team_label(team: str) -> str:
+    """Название команды с эмодзи (для известных команд — из готовой таблицы)."""
+    label = _TEAM_LABELS.get(team)
+    return label if label is not None else format_team_with_emoji(team)
+
+
+def format_player_line(player: PlayerInfo) -> str:
+    """Строка игрока: Фамилия (Команда 🏆) - Статус [- ВРАТАРЬ 🥅]."""
+    goalie_suffix = f" - ВРАТАРЬ {GOALIE_EMOJI}" if player.is_goalie else ""
+    if player.team:
+        return f"{player.last_name} ({team_label(player.team)}) - {player.status}{goalie_suffix}"
+    return f"{player.last_name} - {player.status}{goalie_suffix}"
+
+
+def format_goalie_line(player: PlayerInfo) -> str:
+    """Строка вратаря в отдельном списке: Фамилия (Команда 🏆)."""
+    if player.team:
+        return f"{player.last_name} ({team_label(player.team)})"
+    return player.last_name
+
+
+def format_status_block(title: str, players: Iterable[PlayerInfo]) -> str:
+    """Нумерованный список игроков одного статуса."""
+    lines = [f"{idx}. {format_player_line(player)}" for idx, player in enumerate(players, start=1)]
+    return "\n".join([title, *(lines or (EMPTY_BLOCK,))])
+
+
+def format_team_block(team_counts: Mapping[str, int]) -> str:
+    """Итоги по командам (полевые игроки со статусом YES)."""
+    return "\n".join(
+        f'Игроков команды "{team_label(team)}" будет на игре - {count}'
+        for team, count in team_counts.items()
     )
-    return f"{title}\n{numbered}"
 
 
-def format_team_summary(yes_players: list) -> str:
-    """Форматирует саммаризацию по командам (без учета вратарей)."""
-    # Исключаем вратарей из подсчета
-    non_goalie_players = [p for p in yes_players if not (p.is_goalie if hasattr(p, 'is_goalie') else p.get("is_goalie", False))]
-    
-    armada_count = sum(1 for p in non_goalie_players if (p.team if hasattr(p, 'team') else p.get("team")) == "Армада")
-    kabany_count = sum(1 for p in non_goalie_players if (p.team if hasattr(p, 'team') else p.get("team")) == "Кабаны")
-    
-    return f'Игроков команды "Армада 🛡️" будет на игре - {armada_count}\nИгроков команды "Кабаны 🐗" будет на игре - {kabany_count}'
+def format_goalies_block(goalies: Iterable[PlayerInfo]) -> str:
+    """Список вратарей со статусом YES."""
+    lines = [f"{idx}. {format_goalie_line(goalie)}" for idx, goalie in enumerate(goalies, start=1)]
+    return "\n".join([f"Вратари {GOALIE_EMOJI}:", *(lines or (EMPTY_BLOCK,))])
+
 
+def summary_block_of(player: PlayerInfo) -> Optional[str]:
+    """В какой блок списка попадает игрок: yes, maybe, no или goalies."""
+    if player.status == STATUS_YES:
+        return "goalies" if player.is_goalie else "yes"
+    if player.status == STATUS_MAYBE:
+        return "maybe"
+    if player.status == STATUS_NO:
+        return "no"
+    return None
 
-def format_goalies_list(yes_players: list) -> str:
-    """Форматирует список вратарей из игроков со статусом YES."""
-    goalies = [p for p in yes_players if (p.is_goalie if hasattr(p, 'is_goalie') else p.get("is_goalie", False))]
+
+def render_summary_blocks(target_date: date, players: Iterable[PlayerInfo]) -> list[str]:
+    """Блоки текста списка за один проход по игрокам (в порядке updated_at).
     
-    if not goalies:
-        return f"Вратари {GOALIE_EMOJI}:\n—"
+    Игроки раскладываются по статусу, команде и признаку вратаря сразу при обходе;
+    команды для итогов берутся из TEAM_EMOJI.
+    """
+    blocks: dict[str, list[PlayerInfo]] = {"yes": [], "maybe": [], "no": [], "goalies": []}
+    team_counts = dict.fromkeys(TEAM_EMOJI, 0)
     
-    lines = []
-    for idx, goalie in enumerate(goalies, start=1):
-        last_name = goalie.last_name if hasattr(goalie, 'last_name') else goalie.get("last_name", "")
-        team = goalie.team if hasattr(goalie, 'team') else goalie.get("team")
-        if team:
-            team_with_emoji = format_team_with_emoji(team)
-            lines.append(f"{idx}. {last_name} ({team_with_emoji})")
-        else:
-            lines.append(f"{idx}. {last_name}")
+    for player in players:
+        block = summary_block_of(player)
+        if block is None:
+            continue
+        blocks[block].append(player)
+        if block == "yes" and player.team in team_counts:
+            team_counts[player.team] += 1
     
-    return f"Вратари {GOALIE_EMOJI}:\n" + "\n".join(lines)
-
-
-def format_summary_message(target_date: date, yes: list, maybe: list, no: list) -> str:
-    header = format_summary_header(target_date)
-    block_yes = format_status_list("Я буду хоккеюги", yes, exclude_goalies=True)
-    block_maybe = format_status_list("Пока не определился", maybe)
-    block_no = format_status_list("Не смогу пойти, сорри", no)
-    team_summary = format_team_summary(yes)
-    goalies_list = format_goalies_list(yes)
-    return "\n\n".join([header, block_yes, block_maybe, block_no, team_summary, goalies_list])
+    return [
+        format_summary_header(target_date),
+        format_status_block(TITLE_YES, blocks["yes"]),
+        format_status_block(TITLE_MAYBE, blocks["maybe"]),
+        format_status_block(TITLE_NO, blocks["no"]),
+        format_team_block(team_counts),
+        format_goalies_block(blocks["goalies"]),
+    ]
+
+
+def render_summary(target_date: date, players: Iterable[PlayerInfo]) -> str:
+    """Текст списка целиком."""
+    return "\n\n".join(render_summary_blocks(target_date, players))
+
+
+def telegram_length(text: str) -> int:
+    """Длина текста так, как её считает Telegram (в UTF-16 единицах)."""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _split_block(block: str, max_chars: int) -> list[str]:
+    """Разбить слишком длинный блок по строкам (строку длиннее лимита — по символам)."""
+    pieces: list[str] = []
+    lines: list[str] = []
+    length = 0
+    for line in block.split("\n"):
+        # Символ занимает не больше двух UTF-16 единиц
+        chunks = [line] if telegram_length(line) <= max_chars else [
+            line[start:start + max_chars // 2] for start in range(0, len(line), max_chars // 2)
+        ]
+        for chunk in chunks:
+            chunk_length = telegram_length(chunk)
+            if lines and length + 1 + chunk_length > max_chars:
+                pieces.append("\n".join(lines))
+                lines, length = [], 0
+            length += chunk_length + (1 if lines else 0)
+            lines.append(chunk)
+    if lines:
+        pieces.append("\n".join(lines))
+    return pieces
+
+
+def split_summary_pages(blocks: Iterable[str], max_chars: int) -> list[str]:
+    """Разложить блоки списка по сообщениям не длиннее max_chars.
+    
+    Страницы разрываются между блоками; блок, который не помещается в одно
+    сообщение, делится по строкам. Пока список помещается целиком, результат —
+    одна страница с тем же текстом, что и render_summary.
+    """
+    pages: list[str] = []
+    current: list[str] = []
+    length = 0
+    for block in blocks:
+        block_length = telegram_length(block)
+        pieces = [block] if block_length <= max_chars else _split_block(block, max_chars)
+        for piece in pieces:
+            piece_length = block_length if piece is block else telegram_length(piece)
+            if current and length + 2 + piece_length > max_chars:
+                pages.append("\n\n".join(current))
+                current, length = [], 0
+            length += piece_length + (2 if current else 0)
+            current.append(piece)
+    if current:
+        pages.append("\n\n".join(current))
+    return pages
 
 
 def parse_notify_time(value: str) -> time: